@@ -13,6 +13,7 @@ import ipaddress
 import platform
 import logging
 import concurrent.futures
+import functools
 import os
 
 # Setup logging
@@ -26,6 +27,7 @@ Live = 2
 Preview = 1
 Clear = 0
 TallySendInterval = 0.25
+TallyKeepaliveInterval = 1.0  # Reinvio del frame invariato per i ricevitori appena accesi
 MCAST_GRP = "224.0.0.20"
 MCAST_PORT = 3000
 TTL = 2
@@ -34,8 +36,22 @@ FallbackIP = "192.168.2.200"
 # =======================================================
 # Variables
 # =======================================================
-TallyState = [0 for _ in range(256)]
-dict_state = {'Live': 0, 'Preview': 0, 'Autolive': 0, 'isActive': True}  # FIX: isActive ora è True
+TallyState = bytearray(256)  # 1 byte per canale tally, inviato cosi com'e
+TALLY_CLEAR_FRAME = bytes([Clear]) * len(TallyState)  # Frame tutto spento per il reset
+
+
+class TallyData:
+    """Stato tally letto dall'ATEM: attributi a slot invece delle chiavi di un dict"""
+    __slots__ = ('live', 'preview', 'autolive', 'is_active')
+
+    def __init__(self):
+        self.live = 0
+        self.preview = 0
+        self.autolive = 0
+        self.is_active = True  # FIX: isActive ora è True
+
+
+tally_data = TallyData()
 ATEM_IP = None
 wifi_mode_ap = False
 lock = threading.Lock()
@@ -52,25 +68,7 @@ def get_local_ip_and_subnet():
         ip = s.getsockname()[0]
         s.close()
         
-        # Migliore gestione della subnet
-        try:
-            if platform.system().lower() == "linux":
-                result = subprocess.check_output(
-                    ["ip", "route", "show", "default"], 
-                    universal_newlines=True,
-                    timeout=5
-                )
-                # Estrai la rete dalla route di default
-                lines = result.strip().split('\n')
-                for line in lines:
-                    if 'dev' in line:
-                        # Assumiamo /24 per semplicita
-                        network = ipaddress.IPv4Interface(f"{ip}/24").network
-                        return ip, network
-        except:
-            pass
-            
-        # Fallback: assumiamo /24
+        # Assumiamo /24: la route di default non cambierebbe il risultato
         network = ipaddress.IPv4Interface(f"{ip}/24").network
         return ip, network
         
@@ -79,6 +77,14 @@ def get_local_ip_and_subnet():
         return None, ipaddress.IPv4Network("192.168.1.0/24", strict=False)
 
 
+def make_sender(sock, addr, buf, connected):
+    """Funzione senza argomenti che invia buf: socket e destinazione fissati una volta all'avvio.
+    functools.partial e implementato in C: nessun frame Python in piu per invio"""
+    if connected:
+        return functools.partial(sock.send, buf)
+    return functools.partial(sock.sendto, buf, addr)
+
+
 def ping(host):
     """Ping singolo per uso generale - manteniamo per compatibilita"""
     try:
@@ -198,6 +204,22 @@ def test_atem_connection(ip_str):
         return False
 
 
+_SRC_CACHE = {}  # videoSource ATEM -> numero input
+
+
+def _src_to_int(value):
+    """Converte un videoSource ATEM (es. 'input3') nel numero input, con cache per valore"""
+    try:
+        return _SRC_CACHE[value]
+    except KeyError:
+        pass
+    
+    value_str = str(value)
+    num = int(value_str.replace("input", "")) if value_str != "input0" else 0
+    _SRC_CACHE[value] = num
+    return num
+
+
 def getAtemData():
     global atem_status
     try:
@@ -207,19 +229,15 @@ def getAtemData():
             if not atem.waitForConnection(timeout=2.0):
                 raise Exception("Timeout connessione ATEM")
 
-        # Leggi i dati dall'ATEM
-        live_source = str(atem.programInput[0].videoSource)
-        preview_source = str(atem.previewInput[0].videoSource)
-        
-        # Converti da "inputX" a numero
-        dict_state['Live'] = int(live_source.replace("input", "")) if live_source != "input0" else 0
-        dict_state['Preview'] = int(preview_source.replace("input", "")) if preview_source != "input0" else 0
-        dict_state['Autolive'] = 0
+        # Leggi i dati dall'ATEM e converti da "inputX" a numero
+        tally_data.live = _src_to_int(atem.programInput[0].videoSource)
+        tally_data.preview = _src_to_int(atem.previewInput[0].videoSource)
+        tally_data.autolive = 0
 
         atem_status['connected'] = True
         atem_status['ip'] = ATEM_IP
         
-        logger.debug(f"ATEM Data - Live: {dict_state['Live']}, Preview: {dict_state['Preview']}")
+        logger.debug("ATEM Data - Live: %d, Preview: %d", tally_data.live, tally_data.preview)
         return True
         
     except Exception as e:
@@ -281,8 +299,8 @@ class ConfigHandler(BaseHTTPRequestHandler):
         <h2>Tally Config RB</h2>
         <p><strong>Stato ATEM:</strong> {"Connesso" if atem_status['connected'] else "Non Connesso"}</p>
         <p><strong>Indirizzo ATEM:</strong> {atem_status['ip'] if atem_status['ip'] else "N/A"}</p>
-        <p><strong>Live Input:</strong> {dict_state['Live']}</p>
-        <p><strong>Preview Input:</strong> {dict_state['Preview']}</p>
+        <p><strong>Live Input:</strong> {tally_data.live}</p>
+        <p><strong>Preview Input:</strong> {tally_data.preview}</p>
         <p><strong>WiFi AP Mode:</strong> {"Attivo" if wifi_mode_ap else "Disattivo"}</p>
         
         <form method="POST">
@@ -379,7 +397,19 @@ if __name__ == "__main__":
     try:
         mcastSock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         mcastSock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, TTL)
-        logger.info(f"Socket multicast configurato: {MCAST_GRP}:{MCAST_PORT}")
+        mcastSock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        # Nessun ricevitore tally su questo host: niente copia in loopback di ogni pacchetto
+        mcastSock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 0)
+        # Destinazione fissa: connect una volta, poi send() senza indirizzo ad ogni ciclo
+        try:
+            mcastSock.connect((MCAST_GRP, MCAST_PORT))
+            mcast_connected = True
+        except OSError as e:
+            # Nessuna route multicast per ora: si usa sendto, che riprova ad ogni invio
+            logger.warning(f"Connect multicast non riuscito ({e}), uso sendto")
+            mcast_connected = False
+        logger.info(f"Socket multicast configurato: {MCAST_GRP}:{MCAST_PORT}, "
+                    f"SO_SNDBUF={mcastSock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)}")
     except Exception as e:
         logger.error(f"Errore setup socket multicast: {e}")
         sys.exit(1)
@@ -388,6 +418,13 @@ if __name__ == "__main__":
     logger.info("=== Avvio loop principale ===")
     error_count = 0
     max_errors = 10
+    last_tally = None  # (attivo, live, preview, autolive) scritto in TallyState
+    next_tick = time.monotonic()  # Scadenza del prossimo invio, senza deriva
+    last_send_time = 0.0  # Ultimo invio, per il keepalive del frame invariato
+    # Riferimenti usati ad ogni ciclo, risolti una volta sola
+    send_frame = make_sender(mcastSock, (MCAST_GRP, MCAST_PORT), TallyState, mcast_connected)
+    tally_len = len(TallyState)
+    state = tally_data
     
     while True:
         try:
@@ -406,28 +443,45 @@ if __name__ == "__main__":
                         find_atem(network)
                     error_count = 0
             
-            # Reset array tally
-            for i in range(len(TallyState)):
-                TallyState[i] = Clear
-            
-            # Imposta stati tally se attivo
-            if dict_state['isActive'] and success:
-                # Preview (solo se non in Autolive mode)
-                if dict_state['Autolive'] == 0 and dict_state['Preview'] > 0:
-                    if dict_state['Preview'] <= len(TallyState):
-                        TallyState[dict_state['Preview'] - 1] = Preview
+            # Riscrivi l'array tally solo se lo stato e cambiato, altrimenti si reinvia lo stesso buffer
+            # Stato letto una volta per ciclo
+            active = state.is_active and success
+            live_val, preview_val, autolive_val = state.live, state.preview, state.autolive
+            tally = (active, live_val, preview_val, autolive_val)
+            changed = tally != last_tally
+            if changed:
+                last_tally = tally
                 
-                # Live
-                if dict_state['Live'] > 0 and dict_state['Live'] <= len(TallyState):
-                    TallyState[dict_state['Live'] - 1] = Live
+                # Indici dei due canali accesi, -1 se spenti
+                # (Preview solo se non in Autolive mode; Live scritto dopo, ha la precedenza)
+                preview_idx = preview_val - 1 if active and autolive_val == 0 and 0 < preview_val <= tally_len else -1
+                live_idx = live_val - 1 if active and 0 < live_val <= tally_len else -1
+                
+                # Reset array tally (una sola copia in C dal frame preallocato)
+                TallyState[:] = TALLY_CLEAR_FRAME
+                if preview_idx >= 0:
+                    TallyState[preview_idx] = Preview
+                if live_idx >= 0:
+                    TallyState[live_idx] = Live
             
-            # Invia dati tally
-            try:
-                mcastSock.sendto(bytearray(TallyState), (MCAST_GRP, MCAST_PORT))
-            except Exception as e:
-                logger.error(f"Errore invio multicast: {e}")
+            # Invia dati tally subito ad ogni cambio, altrimenti solo ogni TallyKeepaliveInterval
+            # (bytearray: nessuna copia per l'invio)
+            now = time.monotonic()
+            if changed or now - last_send_time >= TallyKeepaliveInterval:
+                try:
+                    send_frame()
+                    last_send_time = now
+                except Exception as e:
+                    logger.error(f"Errore invio multicast: {e}")
             
-            time.sleep(TallySendInterval)
+            # Sleep fino alla prossima scadenza: il tempo di lettura ATEM non si accumula
+            next_tick += TallySendInterval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -TallySendInterval:
+                # In ritardo di piu di un ciclo (es. riconnessione ATEM): salta i cicli persi
+                next_tick = time.monotonic()
             
         except KeyboardInterrupt:
             logger.info("Interruzione manuale, chiusura...")
@@ -436,6 +490,7 @@ if __name__ == "__main__":
             logger.error(f"Errore nel loop principale: {e}")
             error_count += 1
             time.sleep(1)
+            next_tick = time.monotonic()
     
     # Cleanup
     try:
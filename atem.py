@@ -6,15 +6,27 @@ import time
 import socket
 import PyATEMMax
 import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import urllib.parse
 import subprocess
 import ipaddress
 import platform
 import logging
 import concurrent.futures
+import functools
 import os
 import json
+import hashlib
+import queue
+import select
+import struct
+import string
+import gzip
+
+try:
+    import orjson  # Opzionale: serializzazione JSON piu veloce
+except ImportError:
+    orjson = None
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,15 +39,26 @@ Live = 2
 Preview = 1
 Clear = 0
 TallySendInterval = 0.25
+TallyKeepaliveInterval = 1.0  # Reinvio del frame invariato per i ricevitori appena accesi
 MCAST_GRP = "224.0.0.20"
 MCAST_PORT = 3000
 TTL = 2
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ATEM_PORT = 9910
+ATEM_HELLO = bytes.fromhex("10 14 53 ab 00 00 00 00 00 3a 00 00 01 00 00 00 00 00 00 00")  # Hello protocollo ATEM
+BMD_OUI_PREFIXES = frozenset({"7c:2e:0d", "8c:1f:64"})  # OUI Blackmagic Design
 FallbackIP = "192.168.2.200"
 CONFIG_FILE = "/home/samuele/Desktop/tally_config.json"
 
 # =======================================================
 # Configuration Management
 # =======================================================
+_saved_config_hash = None  # Hash dell'ultima config scritta su disco
+_pending_config = None  # Ultima config in attesa di scrittura
+_config_lock = threading.Lock()
+_config_dirty = threading.Event()
+
 def load_config():
     """Carica la configurazione dal file JSON"""
     default_config = {
@@ -44,35 +67,80 @@ def load_config():
         'last_successful_ip': None
     }
     
+    global _saved_config_hash
+    
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-            logger.info("Configurazione caricata da file")
-            return config
+        with open(CONFIG_FILE, 'rb') as f:
+            config = json.loads(f.read())
+        _saved_config_hash = hash(json.dumps(config, indent=2))
+        logger.info("Configurazione caricata da file")
+        return config
+    except FileNotFoundError:
+        pass
     except Exception as e:
         logger.warning(f"Errore caricamento config: {e}")
     
     return default_config
 
-def save_config(config):
-    """Salva la configurazione nel file JSON"""
+def _write_config(config):
+    """Scrive la configurazione nel file JSON (solo se cambiata, scrittura atomica)"""
+    global _saved_config_hash
+    
     try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
+        data = json.dumps(config, indent=2)
+        data_hash = hash(data)
+        if data_hash == _saved_config_hash:
+            return
+        
+        # Scrivi su file temporaneo e rinomina: un crash non corrompe la config
+        tmp_file = CONFIG_FILE + ".tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(data)
+        os.replace(tmp_file, CONFIG_FILE)
+        
+        _saved_config_hash = data_hash
         logger.info("Configurazione salvata")
     except Exception as e:
         logger.error(f"Errore salvataggio config: {e}")
 
+def save_config(config):
+    """Accoda il salvataggio: la scrittura avviene nel thread ConfigWriter"""
+    global _pending_config
+    with _config_lock:
+        _pending_config = dict(config)
+    _config_dirty.set()
+
+def flush_config():
+    """Scrive subito l'eventuale configurazione in attesa"""
+    global _pending_config
+    with _config_lock:
+        pending, _pending_config = _pending_config, None
+    if pending is not None:
+        _write_config(pending)
+
+def config_writer_thread_func():
+    """Thread che raggruppa i salvataggi ravvicinati in una sola scrittura"""
+    while True:
+        _config_dirty.wait()
+        time.sleep(0.25)
+        _config_dirty.clear()
+        flush_config()
+
 # =======================================================
 # Variables
 # =======================================================
 config = load_config()
-TallyState = [0 for _ in range(256)]
+TallyState = bytearray(256)  # 1 byte per canale tally, inviato cosi com'e
+TALLY_CLEAR_FRAME = bytes([Clear]) * len(TallyState)  # Frame tutto spento per il reset
 dict_state = {'Live': 0, 'Preview': 0, 'Autolive': 0, 'isActive': True}
 ATEM_IP = config.get('atem_ip') or config.get('last_successful_ip')
 wifi_mode_ap = config.get('wifi_ap_mode', False)
-lock = threading.Lock()
+atem_data_queue = queue.Queue(maxsize=1)  # Ultimi (live, preview) ricevuti via evento ATEM
+last_atem_read = 0.0  # time.monotonic() dell'ultima lettura dati ATEM
+_state_snapshot = (0, 0, 0, True)  # (live, preview, autolive, attivo), sostituito in blocco
+state_change_event = threading.Condition()  # Notifica i client SSE ad ogni cambio di stato
+_state_version = 0  # Incrementato ad ogni cambio notificato
+loop_wakeup = threading.Event()  # Sveglia il loop tally in attesa (fine scansione, nuovo IP)
 atem_status = {
     'connected': False, 
     'ip': None, 
@@ -81,7 +149,8 @@ atem_status = {
     'last_connection_time': None,
     'data_updates': 0,
     'last_live': None,
-    'last_preview': None
+    'last_preview': None,
+    'stale': False  # Ultima lettura non valida, stato precedente mantenuto
 }
 system_stats = {
     'start_time': time.time(),
@@ -91,27 +160,96 @@ system_stats = {
 }
 scan_in_progress = False
 
+MCAST_SOCK = None  # Socket multicast tally: creato all'avvio da create_mcast_socket() e riusato per ogni invio
+_mcast_send = None  # Invio del frame tally (send o sendto), ricreato da connect_mcast_socket()
+
+_sysinfo_cache = {'t': 0.0, 'v': None}  # Cache letture /proc e /sys (TTL 1s)
+_netcache = {'t': 0.0, 'ip': None, 'net': None}  # Cache IP locale e rete (TTL 30s)
+_sys_cache = {'t': 0.0, 'v': None}  # Cache di get_system_info() per le richieste web (TTL 1s)
+
 # =======================================================
 # Helper functions
 # =======================================================
+def make_sender(sock, addr, buf, connected):
+    """Funzione senza argomenti che invia buf: socket connesso (send) o indirizzo esplicito (sendto)"""
+    if connected:
+        return functools.partial(sock.send, buf)
+    return functools.partial(sock.sendto, buf, addr)
+
+def create_mcast_socket():
+    """Crea il socket multicast tally (solo invio: nessun bind)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, TTL)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+    # Nessun ricevitore tally su questo host: niente copia in loopback di ogni pacchetto
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 0)
+    return sock
+
+def set_mcast_interface():
+    """Fissa l'interfaccia di uscita multicast sull'IP locale corrente.
+    Con eth0 e wlan0 attive la scelta del kernel puo cambiare; senza IP la sceglie il kernel"""
+    if MCAST_SOCK is None:
+        return
+    localIP, _ = get_local_ip_and_subnet()
+    try:
+        MCAST_SOCK.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(localIP or "0.0.0.0"))
+        logger.info(f"Interfaccia multicast: {localIP or 'scelta dal kernel'}")
+    except OSError as e:
+        logger.warning(f"Impossibile impostare interfaccia multicast {localIP}: {e}")
+
+def connect_mcast_socket():
+    """Connette il socket alla destinazione fissa (send senza indirizzo ad ogni ciclo).
+    Da ripetere ad ogni cambio di rete: la route risolta dal connect resta legata alla vecchia interfaccia"""
+    global _mcast_send
+    if MCAST_SOCK is None:
+        return
+    try:
+        MCAST_SOCK.connect((MCAST_GRP, MCAST_PORT))
+        connected = True
+    except OSError as e:
+        # Nessuna route multicast per ora (es. AP non ancora attivo): si usa sendto
+        logger.warning(f"Connect multicast non riuscito ({e}), uso sendto")
+        connected = False
+    # TallyState viene modificato sul posto: il sender invia sempre il contenuto corrente
+    _mcast_send = make_sender(MCAST_SOCK, (MCAST_GRP, MCAST_PORT), TallyState, connected)
+
+def _read_hw_info():
+    """Legge temperatura CPU e memoria da /sys e /proc (con cache di 1 secondo)"""
+    now = time.monotonic()
+    if _sysinfo_cache['v'] is not None and now - _sysinfo_cache['t'] < 1.0:
+        return _sysinfo_cache['v']
+    
+    # CPU Temperature (Raspberry Pi specific)
+    cpu_temp = "N/A"
+    if os.path.exists("/sys/class/thermal/thermal_zone0/temp"):
+        with open("/sys/class/thermal/thermal_zone0/temp") as f:
+            cpu_temp = f"{int(f.read()) / 1000:.1f}C"
+    
+    # Memory info - singola passata, esce appena trovati i due valori
+    try:
+        mem_total = mem_free = None
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    mem_total = int(line.split(maxsplit=2)[1]) // 1024
+                elif line.startswith("MemAvailable:"):
+                    mem_free = int(line.split(maxsplit=2)[1]) // 1024
+                else:
+                    continue
+                if mem_total is not None and mem_free is not None:
+                    break
+        mem_usage = f"{mem_total - mem_free}MB / {mem_total}MB ({((mem_total - mem_free) / mem_total * 100):.1f}%)"
+    except:
+        mem_usage = "N/A"
+    
+    _sysinfo_cache['v'] = (cpu_temp, mem_usage)
+    _sysinfo_cache['t'] = now
+    return _sysinfo_cache['v']
+
 def get_system_info():
     """Raccoglie informazioni di sistema dettagliate"""
     try:
-        # CPU Temperature (Raspberry Pi specific)
-        cpu_temp = "N/A"
-        if os.path.exists("/sys/class/thermal/thermal_zone0/temp"):
-            with open("/sys/class/thermal/thermal_zone0/temp") as f:
-                cpu_temp = f"{int(f.read()) / 1000:.1f}C"
-        
-        # Memory info
-        try:
-            with open("/proc/meminfo") as f:
-                mem_info = f.readlines()
-                mem_total = int([x for x in mem_info if 'MemTotal' in x][0].split()[1]) // 1024
-                mem_free = int([x for x in mem_info if 'MemAvailable' in x][0].split()[1]) // 1024
-                mem_usage = f"{mem_total - mem_free}MB / {mem_total}MB ({((mem_total - mem_free) / mem_total * 100):.1f}%)"
-        except:
-            mem_usage = "N/A"
+        cpu_temp, mem_usage = _read_hw_info()
         
         # System uptime
         uptime_seconds = time.time() - system_stats['start_time']
@@ -146,27 +284,34 @@ def get_system_info():
             'reconnections': system_stats.get('reconnection_count', 0)
         }
 
+def cached_system_info(ttl=1.0):
+    """get_system_info() riusato per ttl secondi tra richieste web e client SSE"""
+    now = time.monotonic()
+    if _sys_cache['v'] is None or now - _sys_cache['t'] > ttl:
+        _sys_cache['v'] = get_system_info()
+        _sys_cache['t'] = now
+    return _sys_cache['v']
+
+def _dumps(obj):
+    """Serializza in JSON compatto (bytes UTF-8), con orjson se disponibile"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
 def get_local_ip_and_subnet():
+    """IP locale e rete /24 (con cache di 30 secondi)"""
+    now = time.monotonic()
+    if _netcache['ip'] is not None and now - _netcache['t'] < 30.0:
+        return _netcache['ip'], _netcache['net']
+    
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
         ip = s.getsockname()[0]
         s.close()
         
-        # Network detection for Linux
-        try:
-            if platform.system().lower() == "linux":
-                result = subprocess.check_output(
-                    ["ip", "route", "show", "default"], 
-                    universal_newlines=True,
-                    timeout=5
-                )
-                network = ipaddress.IPv4Interface(f"{ip}/24").network
-                return ip, network
-        except:
-            pass
-            
         network = ipaddress.IPv4Interface(f"{ip}/24").network
+        _netcache.update(t=now, ip=ip, net=network)
         return ip, network
         
     except Exception as e:
@@ -176,70 +321,272 @@ def get_local_ip_and_subnet():
 def ping_host(ip_str):
     """Ping function optimized for threading"""
     try:
-        param = "-n" if platform.system().lower() == "windows" else "-c"
-        command = ["ping", param, "1", "-W", "500", ip_str]
-        result = subprocess.call(
+        if platform.system().lower() == "windows":
+            command = ["ping", "-n", "1", "-w", "300", ip_str]  # -w in millisecondi
+        else:
+            # Linux: -W attesa risposta e -w deadline totale, entrambi in secondi
+            command = ["ping", "-c", "1", "-W", "1", "-w", "1", ip_str]
+        result = subprocess.run(
             command, 
             stdout=subprocess.DEVNULL, 
             stderr=subprocess.DEVNULL,
-            timeout=1
+            timeout=1.5
         )
-        return (ip_str, result == 0)
+        return (ip_str, result.returncode == 0)
     except:
         return (ip_str, False)
 
+_SRC_CACHE = {}  # videoSource ATEM -> numero input
+
+def _src_to_int(value):
+    """Converte un videoSource ATEM (es. 'input3') nel numero input, con cache per valore"""
+    try:
+        return _SRC_CACHE[value]
+    except KeyError:
+        pass
+    
+    value_str = str(value)
+    if value_str.startswith("input"):
+        num = int(value_str[5:])
+    else:
+        num = int(value_str) if value_str.isdigit() else 0
+    
+    _SRC_CACHE[value] = num
+    return num
+
+def _icmp_checksum(data):
+    """Checksum RFC 1071 per pacchetti ICMP"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _icmp_echo_packet(ident, seq):
+    """Costruisce un pacchetto ICMP Echo Request"""
+    payload = b"tally-scan"
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = _icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+def _open_icmp_socket():
+    """Apre un socket ICMP: DGRAM (ping non privilegiato Linux) o RAW (richiede CAP_NET_RAW)"""
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+def icmp_sweep(ip_list, timeout=1.0):
+    """Ping di tutti gli IP da un unico socket ICMP, senza processi ping.
+    Ritorna la lista degli host attivi, oppure None se i socket ICMP non sono disponibili"""
+    try:
+        sock, is_raw = _open_icmp_socket()
+    except OSError as e:
+        logger.debug("Socket ICMP non disponibile: %s", e)
+        return None
+    
+    ident = os.getpid() & 0xFFFF
+    seq_to_ip = {}
+    alive_hosts = []
+    
+    try:
+        sock.setblocking(False)
+        
+        # Invia tutte le Echo Request in sequenza
+        for seq, ip_str in enumerate(ip_list, 1):
+            seq &= 0xFFFF
+            seq_to_ip[seq] = ip_str
+            try:
+                sock.sendto(_icmp_echo_packet(ident, seq), (ip_str, 0))
+            except OSError as e:
+                logger.debug("Errore invio ICMP a %s: %s", ip_str, e)
+        
+        # Raccogli le risposte fino alla scadenza globale
+        deadline = time.monotonic() + timeout
+        while seq_to_ip:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                break
+            try:
+                data, addr = sock.recvfrom(1024)
+            except OSError:
+                continue
+            
+            # I socket RAW includono l'header IP
+            if is_raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            
+            icmp_type, _, _, reply_ident, seq = struct.unpack("!BBHHH", data[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Con SOCK_DGRAM il kernel riscrive e filtra l'identificativo
+            if is_raw and reply_ident != ident:
+                continue
+            
+            if seq_to_ip.get(seq) == addr[0]:
+                alive_hosts.append(seq_to_ip.pop(seq))
+    finally:
+        sock.close()
+    
+    return alive_hosts
+
+def ping_sweep(ip_list):
+    """Ping parallelo tramite il comando ping di sistema (fallback)"""
+    alive_hosts = []
+    total_ips = len(ip_list)
+    
+    # Un processo ping per worker: limita i fork concorrenti sul Pi
+    workers = min(32, max(4, total_ips))
+    scan_timeout = 2 + 1.5 * -(-total_ips // workers)
+    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        future_to_ip = {executor.submit(ping_host, ip): ip for ip in ip_list}
+        
+        completed = 0
+        for future in concurrent.futures.as_completed(future_to_ip, timeout=scan_timeout):
+            completed += 1
+            try:
+                ip_str, is_alive = future.result()
+                if is_alive:
+                    alive_hosts.append(ip_str)
+                    logger.info(f"Host attivo trovato: {ip_str} ({completed}/{total_ips})")
+                elif completed % 20 == 0:
+                    logger.info(f"Progresso ping: {completed}/{total_ips}")
+            except Exception as e:
+                logger.debug("Errore ping: %s", e)
+    
+    return alive_hosts
+
+def atem_udp_probe(ip_str, timeout=0.3):
+    """Probe UDP veloce sulla porta ATEM: True se l'host risponde al pacchetto hello"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            # Socket connesso: un ICMP port-unreachable arriva come ECONNREFUSED
+            sock.connect((ip_str, ATEM_PORT))
+            sock.send(ATEM_HELLO)
+            readable, _, _ = select.select([sock], [], [], timeout)
+            if not readable:
+                return False
+            return len(sock.recv(1500)) >= 12
+    except OSError:
+        return False
+
 def test_atem_connection(ip_str):
     """Test ATEM connection with timeout - VERSIONE MIGLIORATA"""
+    # Scarta subito gli host che non rispondono sulla porta ATEM
+    if not atem_udp_probe(ip_str):
+        logger.debug("Nessuna risposta UDP ATEM da %s", ip_str)
+        return False
+    
     try:
         test_atem = PyATEMMax.ATEMMax()
         test_atem.connect(ip_str)
         
-        if not test_atem.waitForConnection(timeout=5.0):  # Aumentato timeout
+        if not test_atem.waitForConnection(timeout=2.0):  # ATEM in LAN risponde in <200ms
             test_atem.disconnect()
             return False
         
-        # Attendi stabilizzazione dati - IMPORTANTE
-        time.sleep(0.5)
+        # Attendi stabilizzazione dati (il dump iniziale arriva con l'handshake)
+        time.sleep(0.15)
         
-        # Verifica dati multipli per essere sicuri
-        valid_reads = 0
-        for attempt in range(3):
+        # Lettura dati, con un solo tentativo di riserva se non ancora disponibili
+        valid = False
+        for attempt in range(2):
             try:
                 live_val = test_atem.programInput[0].videoSource
                 preview_val = test_atem.previewInput[0].videoSource
                 
                 # Verifica che i dati siano validi (non None e non vuoti)
                 if live_val is not None and preview_val is not None:
-                    live_num = int(str(live_val).replace("input", "")) if str(live_val) != "input0" else 0
-                    preview_num = int(str(preview_val).replace("input", "")) if str(preview_val) != "input0" else 0
+                    live_num = _src_to_int(live_val)
+                    preview_num = _src_to_int(preview_val)
                     
-                    logger.debug(f"ATEM test {ip_str} - tentativo {attempt+1}: Live={live_num}, Preview={preview_num}")
-                    valid_reads += 1
-                
-                time.sleep(0.2)  # Piccola pausa tra le letture
+                    logger.debug("ATEM test %s - tentativo %d: Live=%s, Preview=%s", ip_str, attempt + 1, live_num, preview_num)
+                    valid = True
+                    break
                 
             except Exception as e:
-                logger.debug(f"Errore lettura dati ATEM test: {e}")
-                time.sleep(0.2)
+                logger.debug("Errore lettura dati ATEM test: %s", e)
+            
+            time.sleep(0.05)  # Piccola pausa prima del tentativo di riserva
         
         test_atem.disconnect()
         
-        # Considera valido se almeno 2 letture su 3 sono andate a buon fine
-        if valid_reads >= 2:
-            logger.info(f"ATEM confermato su {ip_str} - {valid_reads}/3 letture valide")
+        if valid:
+            logger.info(f"ATEM confermato su {ip_str}")
             return True
         else:
-            logger.warning(f"ATEM su {ip_str} - solo {valid_reads}/3 letture valide")
+            logger.warning(f"ATEM su {ip_str} - dati non validi")
             return False
             
     except Exception as e:
-        logger.debug(f"ATEM test failed for {ip_str}: {e}")
+        logger.debug("ATEM test failed for %s: %s", ip_str, e)
         try:
             test_atem.disconnect()
         except:
             pass
         return False
 
+def _host_ips(network):
+    """IP host della rete come stringhe, senza creare un IPv4Address per host"""
+    if network.num_addresses <= 2:
+        return [str(ip) for ip in network.hosts()]
+    base = int(network.network_address)
+    return [socket.inet_ntoa(struct.pack("!I", base + i)) for i in range(1, network.num_addresses - 1)]
+
+def read_arp_table():
+    """Legge la cache ARP del kernel: ritorna dict ip -> mac"""
+    mac_map = {}
+    try:
+        with open("/proc/net/arp") as f:
+            next(f)  # Intestazione
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 4 and fields[3] != "00:00:00:00:00:00":
+                    mac_map[fields[0]] = fields[3].lower()
+    except OSError as e:
+        logger.debug("Cache ARP non disponibile: %s", e)
+    return mac_map
+
+def _is_bmd_oui(mac):
+    """True se il MAC appartiene a un prefisso OUI Blackmagic Design"""
+    return mac[:8] in BMD_OUI_PREFIXES
+
+def test_atem_hosts(hosts):
+    """Testa gli host in parallelo, ritorna il primo IP ATEM confermato o None"""
+    found_ip = None
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(hosts)))
+    try:
+        future_to_ip = {executor.submit(test_atem_connection, ip): ip for ip in hosts}
+        
+        for future in concurrent.futures.as_completed(future_to_ip):
+            try:
+                if not future.result():
+                    continue
+            except Exception as e:
+                logger.debug("Errore test ATEM %s: %s", future_to_ip[future], e)
+                continue
+            
+            # A parita di completamento preferisci l'ordine della fase 1
+            for done_future, ip_str in future_to_ip.items():
+                if done_future.done() and not done_future.cancelled() \
+                        and done_future.exception() is None and done_future.result():
+                    found_ip = ip_str
+                    break
+            break
+    finally:
+        # Non attendere i test ancora in corso: si chiudono da soli
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return found_ip
+
 def find_atem(network, force_scan=False):
     """Find ATEM on network with option to force full scan"""
     global ATEM_IP, scan_in_progress
@@ -264,26 +611,17 @@ def find_atem(network, force_scan=False):
         # Phase 1: Parallel ping scan
         logger.info("Fase 1: Scansione ping parallela...")
         
-        alive_hosts = []
-        all_ips = [str(ip) for ip in network.hosts()]
+        all_ips = _host_ips(network)
         total_ips = len(all_ips)
         logger.info(f"Scansione {total_ips} IP in parallelo...")
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=50) as executor:
-            future_to_ip = {executor.submit(ping_host, ip): ip for ip in all_ips}
-            
-            completed = 0
-            for future in concurrent.futures.as_completed(future_to_ip, timeout=12):
-                completed += 1
-                try:
-                    ip_str, is_alive = future.result()
-                    if is_alive:
-                        alive_hosts.append(ip_str)
-                        logger.info(f"Host attivo trovato: {ip_str} ({completed}/{total_ips})")
-                    elif completed % 20 == 0:
-                        logger.info(f"Progresso ping: {completed}/{total_ips}")
-                except Exception as e:
-                    logger.debug(f"Errore ping: {e}")
+        alive_hosts = icmp_sweep(all_ips)
+        if alive_hosts is None:
+            logger.info("Socket ICMP non disponibile, uso ping di sistema")
+            alive_hosts = ping_sweep(all_ips)
+        else:
+            for ip_str in alive_hosts:
+                logger.info(f"Host attivo trovato: {ip_str}")
         
         logger.info(f"Ping completato. Host attivi: {len(alive_hosts)}")
         
@@ -291,29 +629,69 @@ def find_atem(network, force_scan=False):
             logger.warning("Nessun host risponde al ping")
             return False
         
-        # Phase 2: Test ATEM on alive hosts
-        logger.info("Fase 2: Test ATEM sugli host attivi...")
+        # Phase 2: Parallel ATEM test, prima sugli host con MAC Blackmagic
+        mac_map = read_arp_table()
+        bmd_hosts = [ip for ip in alive_hosts if _is_bmd_oui(mac_map.get(ip, ""))]
+        other_hosts = [ip for ip in alive_hosts if ip not in bmd_hosts]
         
-        for i, ip_str in enumerate(alive_hosts, 1):
-            logger.info(f"Test ATEM {i}/{len(alive_hosts)}: {ip_str}")
-            
-            if test_atem_connection(ip_str):
-                ATEM_IP = ip_str
-                config['atem_ip'] = ATEM_IP
-                config['last_successful_ip'] = ATEM_IP
-                save_config(config)
-                logger.info(f"ATEM trovato e salvato: {ATEM_IP}")
-                return True
+        found_ip = None
+        if bmd_hosts:
+            logger.info(f"Fase 2: Test ATEM su {len(bmd_hosts)} host Blackmagic...")
+            found_ip = test_atem_hosts(bmd_hosts)
+        
+        if not found_ip and other_hosts:
+            logger.info(f"Fase 2: Test ATEM in parallelo su {len(other_hosts)} host attivi...")
+            found_ip = test_atem_hosts(other_hosts)
+        
+        if found_ip:
+            ATEM_IP = found_ip
+            config['atem_ip'] = ATEM_IP
+            config['last_successful_ip'] = ATEM_IP
+            save_config(config)
+            logger.info(f"ATEM trovato e salvato: {ATEM_IP}")
+            return True
         
         logger.warning("Nessun ATEM trovato tra gli host attivi")
         return False
         
     finally:
         scan_in_progress = False
+        loop_wakeup.set()
+
+def _on_atem_receive(params):
+    """Callback PyATEMMax: pubblica (live, preview) ad ogni cambio Program/Preview"""
+    if params.get('cmd') not in ('PrgI', 'PrvI'):
+        return
+    
+    switcher = params['switcher']
+    data = (switcher.programInput[0].videoSource, switcher.previewInput[0].videoSource)
+    
+    # Conserva solo il dato piu recente
+    try:
+        atem_data_queue.get_nowait()
+    except queue.Empty:
+        pass
+    try:
+        atem_data_queue.put_nowait(data)
+    except queue.Full:
+        pass
+
+def notify_state_change():
+    """Sveglia i client collegati a /api/events"""
+    global _state_version
+    with state_change_event:
+        _state_version += 1
+        state_change_event.notify_all()
+
+def atem_init():
+    """Crea l'oggetto ATEM e registra il callback sui cambi Program/Preview"""
+    switcher = PyATEMMax.ATEMMax()
+    switcher.registerEvent(switcher.atem.events.receive, _on_atem_receive)
+    return switcher
 
 def getAtemData():
-    """Get data from ATEM mixer - VERSIONE CORRETTA E MIGLIORATA"""
-    global atem_status, system_stats
+    """Get data from ATEM mixer - attende i cambi via evento per max TallySendInterval"""
+    global atem_status, system_stats, last_atem_read, _state_snapshot
     
     try:
         # Verifica e gestione connessione
@@ -329,84 +707,76 @@ def getAtemData():
             atem_status['last_connection_time'] = time.strftime("%H:%M:%S")
             logger.info("Connessione ATEM stabilita")
             
-            # Attendi stabilizzazione dopo connessione - IMPORTANTE
-            time.sleep(0.5)
+            # Forza una lettura completa sulla nuova connessione
+            last_atem_read = 0.0
+            atem_status['stale'] = False
 
-        # LETTURA DATI MIGLIORATA - con retry e validazione
-        live_source = None
-        preview_source = None
-        
-        # Prova fino a 3 volte per ottenere dati validi
-        for attempt in range(3):
-            try:
-                # Leggi i dati dall'ATEM
-                live_source = atem.programInput[0].videoSource
-                preview_source = atem.previewInput[0].videoSource
-                
-                # Verifica che i dati non siano None
-                if live_source is not None and preview_source is not None:
-                    break
-                    
-                logger.debug(f"Dati ATEM None - tentativo {attempt + 1}")
-                time.sleep(0.1)  # Breve pausa prima di riprovare
-                
-            except Exception as e:
-                logger.debug(f"Errore lettura dati ATEM - tentativo {attempt + 1}: {e}")
-                time.sleep(0.1)
+        # Attendi un cambio Program/Preview notificato dall'ATEM
+        try:
+            live_source, preview_source = atem_data_queue.get(timeout=TallySendInterval)
+        except queue.Empty:
+            if time.monotonic() - last_atem_read < 1.0:
+                # Nessun cambio: lo stato attuale resta valido
+                return True
+            
+            # Fallback lento (max 1/s): lettura diretta dei dati ATEM
+            live_source = atem.programInput[0].videoSource
+            preview_source = atem.previewInput[0].videoSource
         
-        # Se dopo 3 tentativi ancora None, solleva eccezione
         if live_source is None or preview_source is None:
+            # Prima lettura non valida: mantieni lo stato precedente e
+            # riprova al prossimo ciclo invece di bloccare il loop
+            if not atem_status['stale']:
+                atem_status['stale'] = True
+                logger.debug("Dati ATEM None - riprovo al prossimo ciclo")
+                return True
             raise Exception(f"Dati ATEM non validi: Live={live_source}, Preview={preview_source}")
         
+        atem_status['stale'] = False
+        last_atem_read = time.monotonic()
+        
         # Conversione e parsing MIGLIORATO
         try:
-            live_str = str(live_source)
-            preview_str = str(preview_source)
-            
-            # Parsing più robusto
-            if live_str.startswith("input"):
-                live_num = int(live_str.replace("input", "")) if live_str != "input0" else 0
-            else:
-                # Gestisci altri formati possibili
-                live_num = int(live_str) if live_str.isdigit() else 0
-                
-            if preview_str.startswith("input"):
-                preview_num = int(preview_str.replace("input", "")) if preview_str != "input0" else 0
-            else:
-                # Gestisci altri formati possibili
-                preview_num = int(preview_str) if preview_str.isdigit() else 0
+            live_num = _src_to_int(live_source)
+            preview_num = _src_to_int(preview_source)
             
             # Validazione range valori
             live_num = max(0, min(live_num, 255))  # Limita a range valido
             preview_num = max(0, min(preview_num, 255))
             
         except (ValueError, AttributeError) as e:
-            logger.error(f"Errore parsing dati ATEM: Live='{live_str}', Preview='{preview_str}' - {e}")
+            logger.error(f"Errore parsing dati ATEM: Live='{live_source}', Preview='{preview_source}' - {e}")
             raise Exception(f"Errore parsing: {e}")
         
-        # Aggiorna lo stato SOLO se i dati sono cambiati o ogni 10 letture
-        with lock:
-            changed = False
-            if dict_state['Live'] != live_num or dict_state['Preview'] != preview_num:
-                changed = True
-                dict_state['Live'] = live_num
-                dict_state['Preview'] = preview_num
-                atem_status['last_live'] = live_num
-                atem_status['last_preview'] = preview_num
-                logger.info(f"STATO CAMBIATO - Live: {live_num}, Preview: {preview_num}")
-            
-            dict_state['Autolive'] = 0  # Reset autolive
-            atem_status['data_updates'] += 1
+        # Pubblica il nuovo stato con un'unica assegnazione (atomica col GIL)
+        prev_live, prev_preview, _, _ = _state_snapshot
+        changed = prev_live != live_num or prev_preview != preview_num
+        _state_snapshot = (live_num, preview_num, 0, dict_state['isActive'])
+        
+        dict_state['Autolive'] = 0  # Reset autolive
+        atem_status['data_updates'] += 1
+        
+        if changed:
+            dict_state['Live'] = live_num
+            dict_state['Preview'] = preview_num
+            atem_status['last_live'] = live_num
+            atem_status['last_preview'] = preview_num
+            logger.info(f"STATO CAMBIATO - Live: {live_num}, Preview: {preview_num}")
+        
+        was_connected = atem_status['connected']
         
         # Log periodico per debug (ogni 40 letture = ~10 secondi)
-        if atem_status['data_updates'] % 40 == 0 or changed:
-            logger.debug(f"ATEM Data - Live: {live_num}, Preview: {preview_num} (Updates: {atem_status['data_updates']})")
+        if (atem_status['data_updates'] % 40 == 0 or changed) and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("ATEM Data - Live: %s, Preview: %s (Updates: %s)", live_num, preview_num, atem_status['data_updates'])
         
         # Aggiorna status
         atem_status['connected'] = True
         atem_status['ip'] = ATEM_IP
         atem_status['last_error'] = None
         
+        if changed or not was_connected:
+            notify_state_change()
+        
         return True
         
     except Exception as e:
@@ -414,8 +784,11 @@ def getAtemData():
         logger.error(f"Errore lettura dati ATEM: {error_msg}")
         
         # Aggiorna status errore
+        notify = atem_status['connected'] or atem_status['last_error'] != error_msg
         atem_status['connected'] = False
         atem_status['last_error'] = error_msg
+        if notify:
+            notify_state_change()
         
         # Disconnetti per forzare riconnessione
         try:
@@ -454,111 +827,116 @@ def setWifiMode(ap_mode=False):
     except Exception as e:
         logger.error(f"Errore WiFi script: {e}")
         return False
+    finally:
+        # La rete e cambiata: IP locale da rileggere e interfaccia multicast da aggiornare
+        _netcache['ip'] = None
+        set_mcast_interface()
+        connect_mcast_socket()
 
 # =======================================================
 # Enhanced Web Server
 # =======================================================
-class ConfigHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        pass  # Suppress HTTP server logs
-        
-    def do_GET(self):
-        """Handle GET requests"""
-        if self.path == "/api/status":
-            # JSON API endpoint for status
-            system_info = get_system_info()
-            status_data = {
-                'atem': atem_status,
-                'tally_state': dict_state,
-                'wifi_ap': wifi_mode_ap,
-                'scan_in_progress': scan_in_progress,
-                'system': system_info,
-                'config': {
-                    'current_atem_ip': ATEM_IP,
-                    'last_successful_ip': config.get('last_successful_ip'),
-                    'wifi_ap_mode': wifi_mode_ap
-                }
-            }
-            
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.end_headers()
-            self.wfile.write(json.dumps(status_data, indent=2).encode('utf-8'))
-            return
-        
-        # Main web interface
-        system_info = get_system_info()
-        
-        # Status indicators with colors
-        atem_status_color = "green" if atem_status['connected'] else "red"
-        atem_status_text = "Connesso" if atem_status['connected'] else "Disconnesso"
-        
-        wifi_status_color = "orange" if wifi_mode_ap else "blue"
-        wifi_status_text = "Access Point" if wifi_mode_ap else "Station Mode"
-        
-        scan_status = "IN CORSO..." if scan_in_progress else "Pronto"
-        scan_button_disabled = "disabled" if scan_in_progress else ""
-        
-        html = f"""
+# Risorse statiche: servite a parte e messe in cache dal browser
+_CSS_BYTES = b"""
+body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+.container { max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+.header { text-align: center; color: #333; margin-bottom: 30px; }
+.status-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin-bottom: 30px; }
+.status-card { background: #f8f9fa; padding: 15px; border-radius: 6px; border-left: 4px solid #007bff; }
+.status-value { font-size: 18px; font-weight: bold; margin-top: 5px; }
+.status-green { color: green; }
+.status-red { color: red; }
+.status-orange { color: orange; }
+.status-blue { color: blue; }
+.form-section { background: #f8f9fa; padding: 20px; border-radius: 6px; margin-bottom: 20px; }
+.form-group { margin-bottom: 15px; }
+.form-group label { display: block; margin-bottom: 5px; font-weight: bold; }
+.form-group input[type="text"] { width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px; box-sizing: border-box; }
+.form-group input[type="checkbox"] { margin-right: 8px; }
+.btn { padding: 10px 20px; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; margin-right: 10px; margin-bottom: 10px; }
+.btn-primary { background-color: #007bff; color: white; }
+.btn-success { background-color: #28a745; color: white; }
+.btn-warning { background-color: #ffc107; color: black; }
+.btn:hover { opacity: 0.8; }
+.btn:disabled { opacity: 0.5; cursor: not-allowed; }
+.tally-display { display: flex; gap: 10px; flex-wrap: wrap; margin-top: 10px; }
+.tally-indicator { width: 60px; height: 40px; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; border-radius: 4px; }
+.tally-live { background-color: red; }
+.tally-preview { background-color: green; }
+.tally-clear { background-color: gray; }
+.log-section { background: #f8f9fa; padding: 15px; border-radius: 6px; margin-top: 20px; }
+.refresh-info { font-size: 12px; color: #666; text-align: center; margin-top: 20px; }
+.debug-info { font-size: 11px; color: #888; margin-top: 5px; }
+"""
+
+_JS_BYTES = """
+function refreshStatus() {
+    fetch('/api/status')
+        .then(response => response.json())
+        .then(applyStatus)
+        .catch(error => console.error('Error:', error));
+}
+
+function applyStatus(data) {
+    updateTallyDisplay(data.tally_state);
+    updateSystemInfo(data.system, data.atem);
+}
+
+function setText(id, text) {
+    const el = document.getElementById(id);
+    if (el) el.textContent = text;
+}
+
+function updateTallyDisplay(state) {
+    // Questa funzione può essere espansa per aggiornare la UI in tempo reale
+}
+
+function updateSystemInfo(system, atem) {
+    // Contatori fuori dalla pagina in cache: arrivano solo da /api/status e /api/events
+    setText('data-updates', atem.data_updates ?? 0);
+    setText('data-updates-total', atem.data_updates ?? 0);
+    setText('uptime', system.uptime);
+    setText('cpu-temp', system.cpu_temp);
+    setText('memory-usage', system.memory_usage);
+    setText('total-packets-sent', system.total_packets_sent);
+}
+
+document.addEventListener('DOMContentLoaded', refreshStatus);
+
+if (window.EventSource) {
+    // Push dal server solo quando lo stato cambia
+    new EventSource('/api/events').onmessage = e => applyStatus(JSON.parse(e.data));
+} else {
+    setInterval(refreshStatus, 3000);  // Ogni 3 secondi
+}
+
+function confirmScan() {
+    return confirm('Avviare la scansione della rete per cercare ATEM? Questo potrebbe richiedere alcuni minuti.');
+}
+""".encode("utf-8")
+
+def _static_entry(body, content_type):
+    """(body, content-type, ETag) per una risorsa statica"""
+    return body, content_type, '"%s"' % hashlib.sha1(body).hexdigest()
+
+_STATIC_FILES = {
+    '/static/app.css': _static_entry(_CSS_BYTES, "text/css; charset=utf-8"),
+    '/static/app.js': _static_entry(_JS_BYTES, "application/javascript; charset=utf-8"),
+}
+
+# Parte statica della pagina: non formattata a ogni richiesta
+_PAGE_HEAD = """
         <!DOCTYPE html>
         <html>
         <head>
             <title>Tally System Controller</title>
             <meta name="viewport" content="width=device-width, initial-scale=1">
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }}
-                .container {{ max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-                .header {{ text-align: center; color: #333; margin-bottom: 30px; }}
-                .status-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin-bottom: 30px; }}
-                .status-card {{ background: #f8f9fa; padding: 15px; border-radius: 6px; border-left: 4px solid #007bff; }}
-                .status-value {{ font-size: 18px; font-weight: bold; margin-top: 5px; }}
-                .status-green {{ color: green; }}
-                .status-red {{ color: red; }}
-                .status-orange {{ color: orange; }}
-                .status-blue {{ color: blue; }}
-                .form-section {{ background: #f8f9fa; padding: 20px; border-radius: 6px; margin-bottom: 20px; }}
-                .form-group {{ margin-bottom: 15px; }}
-                .form-group label {{ display: block; margin-bottom: 5px; font-weight: bold; }}
-                .form-group input[type="text"] {{ width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px; box-sizing: border-box; }}
-                .form-group input[type="checkbox"] {{ margin-right: 8px; }}
-                .btn {{ padding: 10px 20px; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; margin-right: 10px; margin-bottom: 10px; }}
-                .btn-primary {{ background-color: #007bff; color: white; }}
-                .btn-success {{ background-color: #28a745; color: white; }}
-                .btn-warning {{ background-color: #ffc107; color: black; }}
-                .btn:hover {{ opacity: 0.8; }}
-                .btn:disabled {{ opacity: 0.5; cursor: not-allowed; }}
-                .tally-display {{ display: flex; gap: 10px; flex-wrap: wrap; margin-top: 10px; }}
-                .tally-indicator {{ width: 60px; height: 40px; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; border-radius: 4px; }}
-                .tally-live {{ background-color: red; }}
-                .tally-preview {{ background-color: green; }}
-                .tally-clear {{ background-color: gray; }}
-                .log-section {{ background: #f8f9fa; padding: 15px; border-radius: 6px; margin-top: 20px; }}
-                .refresh-info {{ font-size: 12px; color: #666; text-align: center; margin-top: 20px; }}
-                .debug-info {{ font-size: 11px; color: #888; margin-top: 5px; }}
-            </style>
-            <script>
-                function refreshStatus() {{
-                    fetch('/api/status')
-                        .then(response => response.json())
-                        .then(data => {{
-                            console.log('Status updated:', data);
-                            // Aggiorna elementi specifici se necessario
-                            updateTallyDisplay(data.tally_state);
-                        }})
-                        .catch(error => console.error('Error:', error));
-                }}
-                
-                function updateTallyDisplay(state) {{
-                    // Questa funzione può essere espansa per aggiornare la UI in tempo reale
-                }}
-                
-                setInterval(refreshStatus, 3000);  // Ogni 3 secondi
-                
-                function confirmScan() {{
-                    return confirm('Avviare la scansione della rete per cercare ATEM? Questo potrebbe richiedere alcuni minuti.');
-                }}
-            </script>
-        </head>
+            <link rel="stylesheet" href="/static/app.css">
+            <script src="/static/app.js"></script>
+        </head>"""
+
+# Parte dinamica della pagina, compilata una volta in _PAGE_PARTS
+_PAGE_BODY_TEMPLATE = """
         <body>
             <div class="container">
                 <div class="header">
@@ -570,19 +948,19 @@ class ConfigHandler(BaseHTTPRequestHandler):
                 <div class="status-grid">
                     <div class="status-card">
                         <div>Stato ATEM</div>
-                        <div class="status-value status-{atem_status_color.lower()}">{atem_status_text}</div>
-                        <small>IP: {atem_status['ip'] or 'N/A'}<br>
-                        Aggiornamenti dati: {atem_status.get('data_updates', 0)}</small>
-                        {f'<br><small style="color:red">Errore: {atem_status["last_error"]}</small>' if atem_status.get('last_error') else ''}
+                        <div class="status-value status-{atem_status_color}">{atem_status_text}</div>
+                        <small>IP: {atem_ip}<br>
+                        Aggiornamenti dati: <span id="data-updates"></span></small>
+                        {last_error_html}
                         <div class="debug-info">
-                            Tentativi: {atem_status['connection_attempts']}<br>
-                            {f'Ultima connessione: {atem_status["last_connection_time"]}' if atem_status.get('last_connection_time') else 'Mai connesso'}
+                            Tentativi: {connection_attempts}<br>
+                            {last_connection_text}
                         </div>
                     </div>
                     
                     <div class="status-card">
                         <div>Modalita WiFi</div>
-                        <div class="status-value status-{wifi_status_color.lower()}">{wifi_status_text}</div>
+                        <div class="status-value status-{wifi_status_color}">{wifi_status_text}</div>
                         <small>Configurazione di rete attuale</small>
                     </div>
                     
@@ -590,16 +968,16 @@ class ConfigHandler(BaseHTTPRequestHandler):
                         <div>Stato Scansione</div>
                         <div class="status-value">{scan_status}</div>
                         <small>Ricerca automatica ATEM<br>
-                        Scansioni effettuate: {system_info['scan_requests']}</small>
+                        Scansioni effettuate: {scan_requests}</small>
                     </div>
                     
                     <div class="status-card">
                         <div>Sistema</div>
                         <div class="status-value status-green">Online</div>
-                        <small>Uptime: {system_info['uptime']}<br>
-                        CPU: {system_info['cpu_temp']}<br>
-                        RAM: {system_info['memory_usage']}<br>
-                        IP: {system_info['local_ip']}</small>
+                        <small>Uptime: <span id="uptime"></span><br>
+                        CPU: <span id="cpu-temp"></span><br>
+                        RAM: <span id="memory-usage"></span><br>
+                        IP: {local_ip}</small>
                     </div>
                 </div>
                 
@@ -608,15 +986,15 @@ class ConfigHandler(BaseHTTPRequestHandler):
                     <form method="POST">
                         <div class="form-group">
                             <label for="atem_ip">Indirizzo IP ATEM:</label>
-                            <input type="text" id="atem_ip" name="atem_ip" value="{ATEM_IP or ''}" 
+                            <input type="text" id="atem_ip" name="atem_ip" value="{atem_ip_value}" 
                                    placeholder="es. 192.168.2.200" pattern="^(?:[0-9]{{1,3}}\\.?){{4}}$">
-                            <small>IP attuale: {ATEM_IP or 'Non configurato'}</small>
-                            {f'<br><small>Ultimo IP funzionante: {config.get("last_successful_ip", "Nessuno")}</small>' if config.get("last_successful_ip") else ''}
+                            <small>IP attuale: {atem_ip_current}</small>
+                            {last_successful_html}
                         </div>
                         
                         <div class="form-group">
                             <label>
-                                <input type="checkbox" name="wifi_ap" {'checked' if wifi_mode_ap else ''}>
+                                <input type="checkbox" name="wifi_ap" {wifi_checked}>
                                 Abilita modalita Access Point WiFi
                             </label>
                             <small>Crea una rete WiFi dedicata per i dispositivi tally</small>
@@ -632,39 +1010,39 @@ class ConfigHandler(BaseHTTPRequestHandler):
                 <div class="status-card">
                     <h3>Stato Tally Corrente - MIGLIORATO</h3>
                     <div><strong>Input Live:</strong> 
-                        <span style="color: red; font-weight: bold;">{dict_state['Live'] if dict_state['Live'] > 0 else 'Nessuno'}</span>
+                        <span style="color: red; font-weight: bold;">{live_text}</span>
                     </div>
                     <div><strong>Input Preview:</strong> 
-                        <span style="color: green; font-weight: bold;">{dict_state['Preview'] if dict_state['Preview'] > 0 else 'Nessuno'}</span>
+                        <span style="color: green; font-weight: bold;">{preview_text}</span>
                     </div>
-                    <div><strong>Sistema Attivo:</strong> {'Si' if dict_state['isActive'] else 'No'}</div>
+                    <div><strong>Sistema Attivo:</strong> {active_text}</div>
                     
                     <div class="tally-display">
-                        <div class="tally-indicator tally-live">LIVE<br>{dict_state['Live'] if dict_state['Live'] > 0 else '-'}</div>
-                        <div class="tally-indicator tally-preview">PVW<br>{dict_state['Preview'] if dict_state['Preview'] > 0 else '-'}</div>
+                        <div class="tally-indicator tally-live">LIVE<br>{live_short}</div>
+                        <div class="tally-indicator tally-preview">PVW<br>{preview_short}</div>
                     </div>
                     
                     <div class="debug-info">
-                        Ultima lettura LIVE: {atem_status.get('last_live', 'N/A')}<br>
-                        Ultima lettura PREVIEW: {atem_status.get('last_preview', 'N/A')}<br>
-                        Aggiornamenti totali: {atem_status.get('data_updates', 0)}
+                        Ultima lettura LIVE: {last_live}<br>
+                        Ultima lettura PREVIEW: {last_preview}<br>
+                        Aggiornamenti totali: <span id="data-updates-total"></span>
                     </div>
                 </div>
                 
                 <div class="status-card">
                     <h3>Statistiche Sistema</h3>
-                    <div><strong>Pacchetti inviati:</strong> {system_info['total_packets_sent']}</div>
-                    <div><strong>Riconnessioni:</strong> {system_info['reconnections']}</div>
-                    <div><strong>Scansioni effettuate:</strong> {system_info['scan_requests']}</div>
-                    <div><strong>Tentativi connessione:</strong> {atem_status['connection_attempts']}</div>
-                    {f'<div><strong>Ultima connessione:</strong> {atem_status["last_connection_time"]}</div>' if atem_status.get('last_connection_time') else ''}
+                    <div><strong>Pacchetti inviati:</strong> <span id="total-packets-sent"></span></div>
+                    <div><strong>Riconnessioni:</strong> {reconnections}</div>
+                    <div><strong>Scansioni effettuate:</strong> {scan_requests}</div>
+                    <div><strong>Tentativi connessione:</strong> {connection_attempts}</div>
+                    {last_connection_html}
                 </div>
                 
                 <div class="log-section">
                     <h4>Informazioni Tecniche</h4>
-                    <p><strong>Multicast:</strong> {MCAST_GRP}:{MCAST_PORT}</p>
-                    <p><strong>Intervallo invio:</strong> {TallySendInterval}s</p>
-                    <p><strong>File configurazione:</strong> {CONFIG_FILE}</p>
+                    <p><strong>Multicast:</strong> {mcast_grp}:{mcast_port}</p>
+                    <p><strong>Intervallo invio:</strong> {send_interval}s</p>
+                    <p><strong>File configurazione:</strong> {config_file}</p>
                     <p><strong>Script WiFi:</strong> /home/samuele/Desktop/wifi_ap.sh</p>
                     <p><strong>Debugging:</strong> Attivato logging migliorato per ATEM</p>
                 </div>
@@ -676,23 +1054,193 @@ class ConfigHandler(BaseHTTPRequestHandler):
             </div>
         </body>
         </html>"""
+
+def _compile_template(template):
+    """Divide il template in (testo gia codificato UTF-8, campo) una sola volta all'avvio"""
+    return tuple((literal.encode("utf-8"), field) for literal, field, _, _ in string.Formatter().parse(template))
+
+# Testi e colori di stato indicizzati per bool (False, True)
+ATEM_COLOR = ("red", "green")
+ATEM_TEXT = ("Disconnesso", "Connesso")
+WIFI_COLOR = ("blue", "orange")
+WIFI_TEXT = ("Station Mode", "Access Point")
+WIFI_CHECKED = ("", "checked")
+SCAN_STATUS = ("Pronto", "IN CORSO...")
+SCAN_DISABLED = ("", "disabled")
+ACTIVE_TEXT = ("No", "Si")
+
+_PAGE_HEAD_BYTES = _PAGE_HEAD.encode("utf-8")
+_PAGE_PARTS = _compile_template(_PAGE_BODY_TEMPLATE)
+_page_cache = (None, None, None)  # (stato, bytes, bytes gzip) dell'ultima pagina, sostituito in blocco
+
+def render_page():
+    """Renderizza la pagina principale come (html, html gzip); riusa la cache se lo stato non e cambiato"""
+    global _page_cache
+    system_info = cached_system_info()
+    # Valori letti piu volte: un solo lookup ciascuno
+    connected = bool(atem_status['connected'])
+    last_error = atem_status.get('last_error')
+    last_connection_time = atem_status.get('last_connection_time')
+    last_successful_ip = config.get("last_successful_ip")
+    live = dict_state['Live']
+    preview = dict_state['Preview']
+    ap_mode = bool(wifi_mode_ap)
+    scanning = bool(scan_in_progress)
+    atem_ip = ATEM_IP
+    
+    page_data = {
+        'atem_status_color': ATEM_COLOR[connected],
+        'atem_status_text': ATEM_TEXT[connected],
+        'atem_ip': atem_status['ip'] or 'N/A',
+        'last_error_html': f'<br><small style="color:red">Errore: {last_error}</small>' if last_error else '',
+        'connection_attempts': atem_status['connection_attempts'],
+        'last_connection_text': f'Ultima connessione: {last_connection_time}' if last_connection_time else 'Mai connesso',
+        'last_connection_html': f'<div><strong>Ultima connessione:</strong> {last_connection_time}</div>' if last_connection_time else '',
+        'wifi_status_color': WIFI_COLOR[ap_mode],
+        'wifi_status_text': WIFI_TEXT[ap_mode],
+        'wifi_checked': WIFI_CHECKED[ap_mode],
+        'scan_status': SCAN_STATUS[scanning],
+        'scan_button_disabled': SCAN_DISABLED[scanning],
+        'scan_requests': system_info['scan_requests'],
+        'local_ip': system_info['local_ip'],
+        'reconnections': system_info['reconnections'],
+        'atem_ip_value': atem_ip or '',
+        'atem_ip_current': atem_ip or 'Non configurato',
+        'last_successful_html': f'<br><small>Ultimo IP funzionante: {last_successful_ip}</small>' if last_successful_ip else '',
+        'live_text': live if live > 0 else 'Nessuno',
+        'preview_text': preview if preview > 0 else 'Nessuno',
+        'live_short': live if live > 0 else '-',
+        'preview_short': preview if preview > 0 else '-',
+        'active_text': ACTIVE_TEXT[bool(dict_state['isActive'])],
+        'last_live': atem_status.get('last_live', 'N/A'),
+        'last_preview': atem_status.get('last_preview', 'N/A'),
+        'mcast_grp': MCAST_GRP,
+        'mcast_port': MCAST_PORT,
+        'send_interval': TallySendInterval,
+        'config_file': CONFIG_FILE,
+    }
+    
+    # I contatori che cambiano ad ogni invio (pacchetti, uptime, CPU, RAM, aggiornamenti)
+    # non sono nella pagina ma li riempie app.js: la chiave cambia solo con lo stato reale
+    key = tuple(page_data.values())
+    cached_key, cached_html, cached_gz = _page_cache
+    if key == cached_key:
+        return cached_html, cached_gz
+    
+    # Solo i valori dinamici vengono codificati, il testo fisso e gia in bytes
+    parts = [_PAGE_HEAD_BYTES]
+    for literal, field in _PAGE_PARTS:
+        parts.append(literal)
+        if field is not None:
+            parts.append(str(page_data[field]).encode("utf-8"))
+    html = b"".join(parts)
+    html_gz = gzip.compress(html, compresslevel=6)  # Compresso una volta per versione della pagina
+    _page_cache = (key, html, html_gz)
+    return html, html_gz
+
+def build_status():
+    """Dati di stato esposti da /api/status e /api/events"""
+    return {
+        'atem': atem_status,
+        'tally_state': dict_state,
+        'wifi_ap': wifi_mode_ap,
+        'scan_in_progress': scan_in_progress,
+        'system': cached_system_info(),
+        'config': {
+            'current_atem_ip': ATEM_IP,
+            'last_successful_ip': config.get('last_successful_ip'),
+            'wifi_ap_mode': wifi_mode_ap
+        }
+    }
+
+class ConfigHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # Suppress HTTP server logs
+        
+    def do_GET(self):
+        """Handle GET requests"""
+        if self.path == "/api/status":
+            # JSON API endpoint for status
+            self.send_response(200)
+            self.send_header("Content-type", "application/json")
+            self.end_headers()
+            self.wfile.write(_dumps(build_status()))
+            return
+        
+        if self.path == "/api/events":
+            self.send_events()
+            return
+        
+        # Static resources (CSS/JS) con cache del browser
+        static = _STATIC_FILES.get(self.path)
+        if static is not None:
+            self.send_static(*static)
+            return
+        
+        # Main web interface
+        page, page_gz = render_page()
         
         self.send_response(200)
         self.send_header("Content-type", "text/html; charset=utf-8")
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            self.send_header("Content-Encoding", "gzip")
+            page = page_gz
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def send_events(self):
+        """Server-Sent Events: invia lo stato solo quando cambia"""
+        self.send_response(200)
+        self.send_header("Content-type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        
+        seen = -1
+        try:
+            while True:
+                with state_change_event:
+                    state_change_event.wait_for(lambda: _state_version != seen, timeout=30)
+                    version = _state_version
+                
+                if version == seen:
+                    # Nessun cambio: keepalive per rilevare client scollegati
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    seen = version
+                    self.wfile.write(b"data: " + _dumps(build_status()) + b"\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client disconnesso
+
+    def send_static(self, body, content_type, etag):
+        """Invia una risorsa statica, 304 se il browser ha gia la versione corrente"""
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        
+        self.send_response(200)
+        self.send_header("Content-type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "public, max-age=3600")
+        self.send_header("ETag", etag)
         self.end_headers()
-        self.wfile.write(html.encode("utf-8"))
+        self.wfile.write(body)
 
     def do_POST(self):
         """Handle POST requests"""
         try:
             length = int(self.headers.get('Content-Length', 0))
             post_data = self.rfile.read(length).decode('utf-8')
-            params = urllib.parse.parse_qs(post_data)
+            params = dict(urllib.parse.parse_qsl(post_data))
             
             global ATEM_IP
             
             # Handle ATEM scan request
-            if "action" in params and params["action"][0] == "scan":
+            if params.get("action") == "scan":
                 logger.info("Richiesta scansione ATEM dal web interface")
                 
                 def run_scan():
@@ -706,8 +1254,8 @@ class ConfigHandler(BaseHTTPRequestHandler):
                 
             else:
                 # Handle configuration update
-                if "atem_ip" in params and params["atem_ip"][0].strip():
-                    new_ip = params["atem_ip"][0].strip()
+                new_ip = params.get("atem_ip", "").strip()
+                if new_ip:
                     if new_ip != ATEM_IP:
                         ATEM_IP = new_ip
                         config['atem_ip'] = ATEM_IP
@@ -720,6 +1268,7 @@ class ConfigHandler(BaseHTTPRequestHandler):
                                 atem.disconnect()
                         except:
                             pass
+                        loop_wakeup.set()
                 
                 # Handle WiFi mode change
                 new_wifi_mode = "wifi_ap" in params
@@ -735,10 +1284,16 @@ class ConfigHandler(BaseHTTPRequestHandler):
             logger.error(f"Errore elaborazione POST: {e}")
             self.send_error(500, "Errore interno server")
 
+class TallyHTTPServer(ThreadingHTTPServer):
+    """Server web con backlog ampio: i burst di connessioni non vengono rifiutati"""
+    daemon_threads = True
+    request_queue_size = 64
+
 def run_webserver():
     """Run the web server"""
     try:
-        server = HTTPServer(('', 8080), ConfigHandler)
+        # Un thread per richiesta: un client lento non blocca gli altri
+        server = TallyHTTPServer(('', 8080), ConfigHandler)
         logger.info("Web server avviato su porta 8080")
         server.serve_forever()
     except Exception as e:
@@ -750,6 +1305,8 @@ def run_webserver():
 if __name__ == "__main__":
     logger.info("=== Avvio Tally System RB v2.1 - VERSIONE CORRETTA ===")
     
+    threading.Thread(target=config_writer_thread_func, daemon=True, name="ConfigWriter").start()
+    
     # Phase 1: Start web server first (as requested)
     logger.info("Fase 1: Avvio web server...")
     webserver_thread = threading.Thread(target=run_webserver, daemon=True)
@@ -758,7 +1315,7 @@ if __name__ == "__main__":
     logger.info("Web server avviato - Configurazione disponibile su http://[IP]:8080")
     
     # Initialize ATEM object
-    atem = PyATEMMax.ATEMMax()
+    atem = atem_init()
     
     # Phase 2: Try to connect to known ATEM IP first
     if ATEM_IP:
@@ -799,14 +1356,15 @@ if __name__ == "__main__":
             ATEM_IP = FallbackIP
             logger.info(f"Uso IP fallback per permettere configurazione manuale: {ATEM_IP}")
 
-    # Phase 4: Setup multicast socket
+    # Phase 4: Multicast socket
     try:
-        mcastSock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
-        mcastSock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, TTL)
-        logger.info(f"Socket multicast configurato: {MCAST_GRP}:{MCAST_PORT}")
+        MCAST_SOCK = create_mcast_socket()
     except Exception as e:
         logger.error(f"Errore setup socket multicast: {e}")
         sys.exit(1)
+    set_mcast_interface()
+    connect_mcast_socket()
+    logger.info(f"Socket multicast configurato: {MCAST_GRP}:{MCAST_PORT}")
 
     # Phase 5: Main tally loop - VERSIONE MIGLIORATA
     logger.info("=== Avvio loop principale tally - VERSIONE CORRETTA ===")
@@ -819,6 +1377,10 @@ if __name__ == "__main__":
     loop_count = 0
     last_log_time = time.time()
     
+    # Ultimo frame inviato (buffer fisso): i frame identici vengono reinviati solo come keepalive
+    last_frame = bytearray(len(TallyState))
+    last_send_time = 0.0  # Il primo frame parte comunque come keepalive
+    
     while True:
         try:
             loop_count += 1
@@ -826,7 +1388,8 @@ if __name__ == "__main__":
             
             # Skip ATEM operations if scan is in progress
             if scan_in_progress:
-                time.sleep(TallySendInterval)
+                loop_wakeup.wait(TallySendInterval)
+                loop_wakeup.clear()
                 continue
             
             # Get data from ATEM
@@ -880,17 +1443,13 @@ if __name__ == "__main__":
                     consecutive_errors = 0  # Reset counter after recovery attempt
                     time.sleep(2)  # Pausa più lunga dopo recovery
             
-            # Reset tally array
-            for i in range(len(TallyState)):
-                TallyState[i] = Clear
+            # Reset tally array (una sola copia in C)
+            TallyState[:] = TALLY_CLEAR_FRAME
             
             # Set tally states if system is active and ATEM connected
-            if dict_state['isActive'] and (atem_success or consecutive_errors < 5):
-                # Use thread-safe access to dict_state
-                with lock:
-                    live_val = dict_state['Live']
-                    preview_val = dict_state['Preview']
-                    autolive_val = dict_state['Autolive']
+            # Snapshot immutabile: lettura coerente senza lock
+            live_val, preview_val, autolive_val, active = _state_snapshot
+            if active and (atem_success or consecutive_errors < 5):
                 
                 # Preview state (only if not in Autolive mode)
                 if autolive_val == 0 and preview_val > 0:
@@ -901,21 +1460,30 @@ if __name__ == "__main__":
                 if live_val > 0 and live_val <= len(TallyState):
                     TallyState[live_val - 1] = Live
             
-            # Send tally data via multicast
+            # Send tally data via multicast: un solo datagramma con tutti i 256
+            # canali, 1 byte per canale (0=Clear, 1=Preview, 2=Live). Inviato
+            # subito ad ogni cambio, altrimenti ogni TallyKeepaliveInterval
             try:
-                mcastSock.sendto(bytearray(TallyState), (MCAST_GRP, MCAST_PORT))
-                system_stats['total_packets_sent'] += 1
-                
-                # Debug periodico del multicast (ogni 5 minuti)
-                if system_stats['total_packets_sent'] % 1200 == 0:  # 1200 * 0.25s = 5 min
-                    active_tallies = [i+1 for i, state in enumerate(TallyState) if state != Clear]
-                    logger.debug(f"Multicast inviato - Pacchetto #{system_stats['total_packets_sent']}, Tally attive: {active_tallies}")
+                now = time.monotonic()
+                if TallyState != last_frame or now - last_send_time >= TallyKeepaliveInterval:
+                    _mcast_send()  # Globale: setWifiMode lo ricrea dopo il cambio di rete
+                    last_frame[:] = TallyState  # Copia in place, nessuna allocazione
+                    last_send_time = now
+                    system_stats['total_packets_sent'] += 1
+                    
+                    # Debug periodico del multicast (ogni 1200 pacchetti)
+                    if system_stats['total_packets_sent'] % 1200 == 0 and logger.isEnabledFor(logging.DEBUG):
+                        active_tallies = [i+1 for i, state in enumerate(TallyState) if state != Clear]
+                        logger.debug("Multicast inviato - Pacchetto #%d, Tally attive: %s", system_stats['total_packets_sent'], active_tallies)
                     
             except Exception as e:
                 logger.error(f"Errore invio multicast: {e}")
             
-            # Sleep until next cycle
-            time.sleep(TallySendInterval)
+            # Sleep until next cycle (getAtemData ha gia atteso gli eventi ATEM);
+            # senza ATEM attendi al massimo un intervallo o il prossimo risveglio
+            if not atem_success:
+                loop_wakeup.wait(TallySendInterval)
+                loop_wakeup.clear()
             
         except KeyboardInterrupt:
             logger.info("Interruzione manuale ricevuta, chiusura sistema...")
@@ -934,7 +1502,9 @@ if __name__ == "__main__":
             atem.disconnect()
         
         logger.info("Chiusura socket multicast...")
-        mcastSock.close()
+        MCAST_SOCK.close()
+        
+        flush_config()
         
         logger.info("Sistema chiuso correttamente")
     except Exception as e:
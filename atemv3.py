@@ -6,17 +6,35 @@ import time
 import socket
 import PyATEMMax
 import threading
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import urllib.parse
 import subprocess
 import ipaddress
 import platform
 import logging
 import concurrent.futures
+import functools
 import os
 import json
 import queue
+import itertools
+import select
+import signal
+import struct
+import string
+import hashlib
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+
+try:
+    import fcntl  # Solo Unix: lettura netmask dell'interfaccia
+except ImportError:
+    fcntl = None
+
+try:
+    import orjson  # Opzionale: serializzazione JSON piu veloce
+except ImportError:
+    orjson = None
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -29,14 +47,42 @@ Live = 2
 Preview = 1
 Clear = 0
 TallySendInterval = 0.25
+TallyKeepaliveInterval = 1.0  # Reinvio del frame invariato per i ricevitori appena accesi
+TALLY_RT_PRIORITY = 20  # Priorita SCHED_FIFO del loop multicast
+LOG_EVERY = 100  # Cicli del loop multicast tra due log periodici
 MCAST_GRP = "224.0.0.20"
 MCAST_PORT = 3000
 TTL = 2
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_SEND_WAIT = 0.05  # Attesa massima per buffer di invio ICMP pieno
+DISCOVERY_LIVE_INTERVAL = 60  # Secondi tra i probe degli host noti quando l'ATEM non e connesso
+DISCOVERY_FULL_INTERVAL = 300  # Secondi tra le scansioni complete in background
+CONFIG_DEBOUNCE = 0.5  # Secondi di attesa per raggruppare modifiche di configurazione ravvicinate
+PING_WAIT_TIMEOUT = 2.0  # Secondi senza nessun ping completato prima di abbandonare lo sweep
+ATEM_PORT = 9910
+DISCARD_PORT = 9  # Porta UDP discard: usata solo per far risolvere l'ARP
+ATEM_HELLO_PACING = 0.002  # Secondi tra due hello ATEM: nessuna raffica verso la rete
+BLACKMAGIC_OUIS = ("7c:2e:0d",)  # Prefissi MAC Blackmagic Design: provati per primi
+ATEM_HELLO = bytes.fromhex("10 14 53 ab 00 00 00 00 00 3a 00 00 01 00 00 00 00 00 00 00")  # Hello protocollo ATEM
 FallbackIP = "192.168.2.200"
 CONFIG_FILE = "/home/samuele/Desktop/tally_config.json"
 ATEM_TIMEOUT = 5.0  # Timeout per le operazioni ATEM
+SHUTDOWN_TIMEOUT = 1.0  # Attesa massima per lock ATEM e thread lettore alla chiusura
 ATEM_RECONNECT_DELAY = 5  # Secondi prima di tentare riconnessione
 ATEM_DATA_STALE_TIMEOUT = 10  # Secondi prima di considerare i dati obsoleti
+ATEM_HEARTBEAT_INTERVAL = 1.0  # Secondi tra le letture dirette di controllo
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+MIN_SCAN_PREFIX = 22  # Reti piu grandi vengono ridotte a /22 attorno all'IP locale
+MAX_KNOWN_HOSTS = 32  # Host attivi ricordati in config per le scansioni successive
+NET_CACHE_TTL = 60  # Secondi di validita della cache IP locale/rete
+THERMAL_PATH = "/sys/class/thermal/thermal_zone0/temp"
+MEMINFO_TTL = 1.0  # Secondi di validita della lettura di /proc/meminfo
+SYSINFO_TTL = 0.5  # Secondi in cui le richieste web condividono lo stesso get_system_info()
+_PLATFORM = platform.system().lower()  # Calcolato una volta, non per ogni ping
+_IS_WINDOWS = _PLATFORM == "windows"
+_PING_CMD_PREFIX = ("ping", "-n" if _IS_WINDOWS else "-c", "1", "-W", "200")  # Timeout ridotto a 200ms
 
 # =======================================================
 # Configuration Management
@@ -46,7 +92,9 @@ def load_config():
     default_config = {
         'atem_ip': None,
         'wifi_ap_mode': False,
-        'last_successful_ip': None
+        'last_successful_ip': None,
+        'known_alive_ips': [],
+        'tally_cpu': None  # CPU del loop multicast, None = ultima disponibile
     }
     
     try:
@@ -72,14 +120,42 @@ def save_config(config):
 # =======================================================
 # Variables
 # =======================================================
+@dataclass(slots=True, frozen=True)
+class TallySnapshot:
+    """Stato tally pubblicato dal lettore ATEM, sostituito in blocco e letto senza lock"""
+    live: int
+    preview: int
+    autolive: int
+    ts: float | None  # time.monotonic() del dato, None se mai ricevuto
+    stale_at: float = 0.0  # time.monotonic() oltre cui il dato e obsoleto (calcolato una volta)
+
 config = load_config()
-TallyState = [0 for _ in range(256)]
+TallyState = bytearray(256)  # 1 byte per canale tally, inviato cosi com'e
+TALLY_CLEAR_FRAME = bytes([Clear]) * len(TallyState)  # Frame tutto spento per il reset
 dict_state = {'Live': 0, 'Preview': 0, 'Autolive': 0, 'isActive': True}
 ATEM_IP = config.get('atem_ip') or config.get('last_successful_ip')
 wifi_mode_ap = config.get('wifi_ap_mode', False)
-lock = threading.Lock()
-atem_lock = threading.Lock()  # Lock dedicato per l'oggetto ATEM
-atem_data_queue = queue.Queue()  # Queue per passare dati tra thread
+# Solo connect/disconnect prendono atem_lock. Le letture (read_data,
+# is_connection_alive) avvengono solo dal thread lettore ATEM, unico
+# utilizzatore dell'oggetto ATEM, e non richiedono lock
+atem_lock = threading.Lock()  # Lock dedicato per creazione/chiusura della connessione ATEM
+_snapshot = TallySnapshot(0, 0, 0, None)  # Ultimo stato tally valido
+# publish_atem_data e chiamata dal thread eventi PyATEMMax e dall'heartbeat del lettore:
+# confronto e pubblicazione serializzati (il loop multicast legge _snapshot senza lock)
+_publish_lock = threading.Lock()
+_netcache = {'t': 0.0, 'ip': None, 'net': None}  # Cache IP locale e rete
+_meminfo_cache = (0.0, None)  # (istante monotonic, stringa uso memoria)
+_sys_cache = {'t': 0.0, 'v': None}  # Cache di get_system_info() per le richieste web
+_sys_cache_lock = threading.Lock()  # Un solo ricalcolo anche con piu client in contemporanea
+def _open_readonly(path):
+    """Descrittore aperto una volta sola: ogni lettura e un pread, senza open/close per richiesta"""
+    try:
+        return os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+
+_THERMAL_FD = _open_readonly(THERMAL_PATH)
+_MEMINFO_FD = _open_readonly("/proc/meminfo")
 atem_status = {
     'connected': False, 
     'ip': None, 
@@ -92,15 +168,32 @@ atem_status = {
     'last_data_time': None,  # Timestamp ultimo dato ricevuto
     'reconnect_in_progress': False
 }
+# Copie immutabili di atem_status e dict_state per la web UI: (atem, tally, istante monotonic).
+# Chi scrive modifica i dict di lavoro e poi pubblica una nuova tupla con publish_status()
+_status_snapshot = (dict(atem_status), dict(dict_state), 0.0)
 system_stats = {
     'start_time': time.time(),
     'total_packets_sent': 0,
+    'send_errors': 0,
     'scan_requests': 0,
     'reconnection_count': 0
 }
 scan_in_progress = False
 atem_reader_thread = None
 atem_reader_stop_event = threading.Event()
+tally_changed = threading.Event()  # Impostato dal lettore ATEM quando cambia lo stato tally
+atem_reader_dead = threading.Event()  # Impostato se il thread lettore termina senza richiesta di stop
+wifi_request_queue = queue.Queue()  # Cambi modalita WiFi richiesti dal web, eseguiti in background
+reader_request_queue = queue.Queue()  # Riavvii del lettore richiesti dal web (True = salva anche la config)
+_INPUT_VALUE_CACHE = {}  # videoSource ATEM -> numero input
+# Pool condivisi tra le scansioni: niente creazione di 100 thread ad ogni ricerca.
+# I worker nascono dal primo thread che sottomette (anche una scansione SCHED_IDLE):
+# l'initializer li riporta a priorita normale, cosi non ereditano SCHED_IDLE per sempre
+_SCAN_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 1) * 4), thread_name_prefix="scan",
+    initializer=lambda: set_normal_priority())
+_ATEM_TEST_POOL = concurrent.futures.ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="atem-test", initializer=lambda: set_normal_priority())
 
 # =======================================================
 # ATEM Connection Management Class
@@ -108,12 +201,17 @@ atem_reader_stop_event = threading.Event()
 class ATEMConnectionManager:
     """Gestisce la connessione ATEM in modo robusto"""
     
-    def __init__(self):
+    def __init__(self, on_data=None):
+        self.on_data = on_data  # Callback (live, preview) ad ogni cambio Program/Preview
         self.atem = None
         self.ip = None
-        self.connected = False
+        self.connected_event = threading.Event()  # Stato connessione leggibile da ogni thread
         self.last_error = None
         self.reconnect_timer = None
+    
+    @property
+    def connected(self):
+        return self.connected_event.is_set()
         
     def connect(self, ip):
         """Connette all'ATEM con timeout e gestione errori"""
@@ -129,6 +227,8 @@ class ATEMConnectionManager:
                 
                 # Crea nuova connessione
                 self.atem = PyATEMMax.ATEMMax()
+                if self.on_data is not None:
+                    self.atem.registerEvent(self.atem.atem.events.receive, self._on_receive)
                 self.atem.connect(ip)
                 
                 # Attendi connessione con timeout
@@ -144,14 +244,14 @@ class ATEMConnectionManager:
                     raise Exception("Impossibile leggere dati iniziali dall'ATEM")
                 
                 self.ip = ip
-                self.connected = True
+                self.connected_event.set()
                 self.last_error = None
                 logger.info(f"Connesso con successo ad ATEM {ip}")
                 return True
                 
             except Exception as e:
                 self.last_error = str(e)
-                self.connected = False
+                self.connected_event.clear()
                 logger.error(f"Errore connessione ATEM {ip}: {e}")
                 
                 # Cleanup
@@ -164,45 +264,83 @@ class ATEMConnectionManager:
                 
                 return False
     
-    def disconnect(self):
-        """Disconnette dall'ATEM in modo sicuro"""
-        with atem_lock:
-            if self.atem is not None:
+    def disconnect(self, timeout=-1):
+        """Disconnette dall'ATEM in modo sicuro.
+        Con timeout non attende oltre un connect in corso: chiude l'oggetto ATEM senza lock"""
+        locked = atem_lock.acquire(timeout=timeout)
+        try:
+            if not locked:
+                logger.warning("Connessione ATEM in corso, chiusura senza attendere")
+            atem = self.atem
+            if atem is not None:
                 try:
-                    self.atem.disconnect()
+                    atem.disconnect()
                 except:
                     pass
-                self.atem = None
-            self.connected = False
+                if locked:
+                    self.atem = None  # Senza lock l'oggetto lo rilascia il connect in corso
+            self.connected_event.clear()
             logger.info("Disconnesso da ATEM")
+        finally:
+            if locked:
+                atem_lock.release()
     
     def read_data(self):
-        """Legge i dati dall'ATEM con gestione errori"""
-        with atem_lock:
-            if self.atem is None or not self.connected:
-                return None, None
+        """Legge i dati dall'ATEM con gestione errori (solo dal thread lettore)"""
+        atem = self.atem  # Riferimento locale: disconnect() puo azzerarlo in parallelo
+        if atem is None or not self.connected:
+            return None, None
+        
+        try:
+            live = atem.programInput[0].videoSource
+            preview = atem.previewInput[0].videoSource
             
-            try:
-                live = self.atem.programInput[0].videoSource
-                preview = self.atem.previewInput[0].videoSource
-                
-                if live is None or preview is None:
-                    raise Exception("Dati ATEM None")
-                
-                # Parse dei valori
-                live_num = self._parse_input_value(live)
-                preview_num = self._parse_input_value(preview)
-                
-                return live_num, preview_num
-                
-            except Exception as e:
-                logger.error(f"Errore lettura dati ATEM: {e}")
-                self.last_error = str(e)
-                # Non disconnettiamo subito, lasciamo che il retry lo gestisca
-                return None, None
+            if live is None or preview is None:
+                raise Exception("Dati ATEM None")
+            
+            # Parse dei valori
+            live_num = self._parse_input_value(live)
+            preview_num = self._parse_input_value(preview)
+            
+            return live_num, preview_num
+            
+        except Exception as e:
+            logger.error(f"Errore lettura dati ATEM: {e}")
+            self.last_error = str(e)
+            # Non disconnettiamo subito, lasciamo che il retry lo gestisca
+            return None, None
+    
+    def _on_receive(self, params):
+        """Callback PyATEMMax: notifica subito i cambi Program/Preview"""
+        if params.get('cmd') not in ('PrgI', 'PrvI') or not self.connected:
+            return
+        
+        try:
+            switcher = params['switcher']
+            live = switcher.programInput[0].videoSource
+            preview = switcher.previewInput[0].videoSource
+            if live is None or preview is None:
+                return
+            self.on_data(self._parse_input_value(live), self._parse_input_value(preview))
+        except Exception as e:
+            logger.debug("Errore evento ATEM: %s", e)
     
     def _parse_input_value(self, value):
-        """Parse del valore input ATEM"""
+        """Parse del valore input ATEM, con cache per valore (enum videoSource)"""
+        try:
+            return _INPUT_VALUE_CACHE[value]
+        except (KeyError, TypeError):
+            pass
+        
+        num = self._parse_input_value_slow(value)
+        try:
+            _INPUT_VALUE_CACHE[value] = num
+        except TypeError:
+            pass  # Valore non hashable: nessuna cache
+        return num
+    
+    def _parse_input_value_slow(self, value):
+        """Parse del valore input ATEM da stringa"""
         try:
             value_str = str(value)
             if value_str.startswith("input"):
@@ -217,26 +355,70 @@ class ATEMConnectionManager:
             return 0
     
     def is_connection_alive(self):
-        """Verifica se la connessione è ancora attiva"""
-        with atem_lock:
-            if self.atem is None or not self.connected:
-                return False
-            
-            try:
-                # Prova a leggere un valore per verificare la connessione
-                test = self.atem.programInput[0].videoSource
-                return test is not None
-            except:
-                return False
-
-# Istanza globale del connection manager
-atem_manager = ATEMConnectionManager()
+        """Verifica se la connessione è ancora attiva (solo dal thread lettore)"""
+        atem = self.atem
+        if atem is None or not self.connected:
+            return False
+        
+        try:
+            # Prova a leggere un valore per verificare la connessione
+            test = atem.programInput[0].videoSource
+            return test is not None
+        except:
+            return False
 
 # =======================================================
 # ATEM Reader Thread Function
 # =======================================================
+def publish_atem_data(live_value, preview_value):
+    """Aggiorna lo stato tally con una lettura ATEM valida (evento o heartbeat)"""
+    global _snapshot
+    with _publish_lock:
+        prev = _snapshot
+        # Un'unica assegnazione di riferimento: il loop multicast lo legge senza lock
+        now = time.monotonic()
+        _snapshot = TallySnapshot(live_value, preview_value, 0, now, now + ATEM_DATA_STALE_TIMEOUT)
+    
+        # Tally cambiate (o dati tornati freschi): sveglia subito il loop multicast
+        changed = prev.live != live_value or prev.preview != preview_value
+        if changed or now >= prev.stale_at:
+            tally_changed.set()
+    
+        # Copie per la web UI (solo visualizzazione)
+        if changed:
+            logger.info(f"Stato ATEM aggiornato - Live: {live_value}, Preview: {preview_value}")
+            dict_state['Live'] = live_value
+            dict_state['Preview'] = preview_value
+            dict_state['Autolive'] = 0
+            atem_status['last_live'] = live_value
+            atem_status['last_preview'] = preview_value
+    
+        atem_status['last_data_time'] = time.time()
+        atem_status['data_updates'] += 1
+        publish_status()
+
+def publish_status():
+    """Pubblica una copia coerente di atem_status e dict_state con un'unica assegnazione"""
+    global _status_snapshot
+    _status_snapshot = (dict(atem_status), dict(dict_state), time.monotonic())
+
+# Istanza globale del connection manager: i cambi arrivano via evento
+atem_manager = ATEMConnectionManager(on_data=publish_atem_data)
+
 def atem_reader_thread_func():
-    """Thread dedicato per la lettura dati ATEM"""
+    """Thread dedicato per la lettura dati ATEM; segnala al loop principale un'uscita inattesa"""
+    try:
+        _atem_reader_loop()
+    finally:
+        if not atem_reader_stop_event.is_set():
+            atem_reader_dead.set()
+
+def _handle_sigterm(signum, frame):
+    """SIGTERM (systemd/docker): stessa chiusura ordinata di Ctrl+C"""
+    raise KeyboardInterrupt
+
+def _atem_reader_loop():
+    """Ciclo di connessione e lettura dati ATEM"""
     global atem_status, dict_state
     
     logger.info("Thread lettore ATEM avviato")
@@ -252,6 +434,7 @@ def atem_reader_thread_func():
                 if current_time - last_reconnect_attempt >= ATEM_RECONNECT_DELAY:
                     logger.info(f"Tentativo riconnessione ad ATEM {ATEM_IP}")
                     atem_status['reconnect_in_progress'] = True
+                    publish_status()
                     
                     if atem_manager.connect(ATEM_IP):
                         atem_status['connected'] = True
@@ -260,16 +443,22 @@ def atem_reader_thread_func():
                         atem_status['connection_attempts'] += 1
                         system_stats['reconnection_count'] += 1
                         consecutive_errors = 0
+                        
+                        # Ricorda l'IP funzionante per il prossimo avvio
+                        if config.get('last_successful_ip') != ATEM_IP:
+                            config['last_successful_ip'] = ATEM_IP
+                            save_config(config)
                     else:
                         atem_status['connected'] = False
                         atem_status['last_error'] = atem_manager.last_error
                     
                     atem_status['reconnect_in_progress'] = False
+                    publish_status()
                     last_reconnect_attempt = current_time
                 
-                # Se non connesso, attendi prima di riprovare
+                # Se non connesso, attendi prima di riprovare (interrompibile dalla chiusura)
                 if not atem_manager.connected:
-                    time.sleep(1)
+                    atem_reader_stop_event.wait(1)
                     continue
             
             # Leggi dati dall'ATEM
@@ -277,25 +466,12 @@ def atem_reader_thread_func():
                 live_value, preview_value = atem_manager.read_data()
                 
                 if live_value is not None and preview_value is not None:
-                    # Aggiorna stato con lock
-                    with lock:
-                        if dict_state['Live'] != live_value or dict_state['Preview'] != preview_value:
-                            logger.info(f"Stato ATEM aggiornato - Live: {live_value}, Preview: {preview_value}")
-                        
-                        dict_state['Live'] = live_value
-                        dict_state['Preview'] = preview_value
-                        dict_state['Autolive'] = 0
-                        
-                        atem_status['last_live'] = live_value
-                        atem_status['last_preview'] = preview_value
-                        atem_status['last_data_time'] = time.time()
-                        atem_status['data_updates'] += 1
-                    
+                    publish_atem_data(live_value, preview_value)
                     consecutive_errors = 0
                     
                     # Log periodico
                     if atem_status['data_updates'] % 100 == 0:
-                        logger.debug(f"ATEM dati OK - Updates: {atem_status['data_updates']}")
+                        logger.debug("ATEM dati OK - Updates: %d", atem_status['data_updates'])
                     
                 else:
                     consecutive_errors += 1
@@ -306,15 +482,17 @@ def atem_reader_thread_func():
                         atem_manager.disconnect()
                         atem_status['connected'] = False
                         atem_status['last_error'] = "Troppi errori di lettura"
+                        publish_status()
                         consecutive_errors = 0
-                        time.sleep(ATEM_RECONNECT_DELAY)
+                        atem_reader_stop_event.wait(ATEM_RECONNECT_DELAY)
             
-            # Breve pausa tra letture
-            time.sleep(0.1)  # 100ms tra le letture
+            # I cambi arrivano via evento: la lettura diretta e solo un heartbeat
+            # che mantiene freschi i dati e verifica la connessione
+            atem_reader_stop_event.wait(ATEM_HEARTBEAT_INTERVAL)
             
         except Exception as e:
             logger.error(f"Errore critico nel thread lettore ATEM: {e}")
-            time.sleep(1)
+            atem_reader_stop_event.wait(1)
     
     logger.info("Thread lettore ATEM terminato")
 
@@ -326,19 +504,14 @@ def get_system_info():
     try:
         # CPU Temperature (Raspberry Pi specific)
         cpu_temp = "N/A"
-        if os.path.exists("/sys/class/thermal/thermal_zone0/temp"):
-            with open("/sys/class/thermal/thermal_zone0/temp") as f:
-                cpu_temp = f"{int(f.read()) / 1000:.1f}°C"
+        if _THERMAL_FD is not None:
+            try:
+                cpu_temp = f"{int(os.pread(_THERMAL_FD, 16, 0)) / 1000:.1f}°C"
+            except (OSError, ValueError):
+                pass
         
         # Memory info
-        try:
-            with open("/proc/meminfo") as f:
-                mem_info = f.readlines()
-                mem_total = int([x for x in mem_info if 'MemTotal' in x][0].split()[1]) // 1024
-                mem_free = int([x for x in mem_info if 'MemAvailable' in x][0].split()[1]) // 1024
-                mem_usage = f"{mem_total - mem_free}MB / {mem_total}MB ({((mem_total - mem_free) / mem_total * 100):.1f}%)"
-        except:
-            mem_usage = "N/A"
+        mem_usage = get_memory_usage()
         
         # System uptime
         uptime_seconds = time.time() - system_stats['start_time']
@@ -354,8 +527,9 @@ def get_system_info():
         
         # Controlla se i dati ATEM sono obsoleti
         data_freshness = "N/A"
-        if atem_status.get('last_data_time'):
-            age = time.time() - atem_status['last_data_time']
+        last_data_time = _status_snapshot[0].get('last_data_time')
+        if last_data_time:
+            age = time.time() - last_data_time
             if age < 1:
                 data_freshness = "Tempo reale"
             elif age < 10:
@@ -369,6 +543,7 @@ def get_system_info():
             'uptime': uptime_str,
             'local_ip': local_ip,
             'total_packets_sent': system_stats['total_packets_sent'],
+            'send_errors': system_stats['send_errors'],
             'scan_requests': system_stats['scan_requests'],
             'reconnections': system_stats['reconnection_count'],
             'data_freshness': data_freshness
@@ -381,32 +556,158 @@ def get_system_info():
             'uptime': 'N/A',
             'local_ip': 'N/A',
             'total_packets_sent': system_stats.get('total_packets_sent', 0),
+            'send_errors': system_stats.get('send_errors', 0),
             'scan_requests': system_stats.get('scan_requests', 0),
             'reconnections': system_stats.get('reconnection_count', 0),
             'data_freshness': 'N/A'
         }
 
+def cached_system_info(ttl=SYSINFO_TTL):
+    """get_system_info() riusato per ttl secondi tra tutte le richieste web"""
+    with _sys_cache_lock:
+        now = time.monotonic()
+        if _sys_cache['v'] is None or now - _sys_cache['t'] >= ttl:
+            _sys_cache['v'] = get_system_info()
+            _sys_cache['t'] = now
+        return _sys_cache['v']
+
+def _dumps(obj):
+    """Serializza in JSON compatto (bytes UTF-8), con orjson se disponibile"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+def _meminfo_kb(buf, key):
+    """Valore in kB di una chiave di /proc/meminfo gia letto in memoria"""
+    i = buf.find(key)
+    if i < 0:
+        raise ValueError(key)
+    i += len(key)
+    return int(buf[i:buf.find(b'kB', i)])
+
+def get_memory_usage():
+    """Uso memoria da /proc/meminfo, letto in un'unica read() (cache di MEMINFO_TTL secondi)"""
+    global _meminfo_cache
+    now = time.monotonic()
+    cached_time, cached_usage = _meminfo_cache
+    if cached_usage is not None and now - cached_time < MEMINFO_TTL:
+        return cached_usage
+    
+    try:
+        # Una sola read dall'inizio: evita letture parziali se il kernel aggiorna il file nel mezzo
+        if _MEMINFO_FD is None:
+            raise OSError("/proc/meminfo non disponibile")
+        buf = os.pread(_MEMINFO_FD, 8192, 0)
+        mem_total = _meminfo_kb(buf, b'MemTotal:') // 1024
+        mem_free = _meminfo_kb(buf, b'MemAvailable:') // 1024
+        mem_usage = f"{mem_total - mem_free}MB / {mem_total}MB ({((mem_total - mem_free) / mem_total * 100):.1f}%)"
+    except (OSError, ValueError, ZeroDivisionError):
+        mem_usage = "N/A"
+    
+    _meminfo_cache = (now, mem_usage)
+    return mem_usage
+
+def make_sender(sock, addr, buf, connected):
+    """Funzione senza argomenti che invia buf: socket e destinazione fissati una volta all'avvio.
+    functools.partial e implementato in C: nessun frame Python in piu per invio"""
+    if connected:
+        return functools.partial(sock.send, buf)
+    return functools.partial(sock.sendto, buf, addr)
+
+def set_idle_priority():
+    """Porta il thread corrente a SCHED_IDLE (solo Linux): gira solo con CPU libera"""
+    if not hasattr(os, "sched_setscheduler"):
+        return
+    try:
+        os.sched_setscheduler(threading.get_native_id(), os.SCHED_IDLE, os.sched_param(0))
+    except OSError as e:
+        logger.debug(f"SCHED_IDLE non disponibile: {e}")
+
+def set_normal_priority():
+    """Riporta il thread corrente a SCHED_OTHER (solo Linux), es. dopo l'eredita da SCHED_IDLE"""
+    if not hasattr(os, "sched_setscheduler"):
+        return
+    try:
+        os.sched_setscheduler(threading.get_native_id(), os.SCHED_OTHER, os.sched_param(0))
+    except OSError as e:
+        logger.debug(f"SCHED_OTHER non disponibile: {e}")
+
+def set_tally_priority(cpu=None):
+    """Fissa il thread corrente su una CPU (default l'ultima) e prova SCHED_FIFO (solo Linux).
+    Con SCHED_RESET_ON_FORK i thread creati in seguito non ereditano la priorita realtime"""
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            if cpu is None:
+                cpu = max(os.sched_getaffinity(0))
+            os.sched_setaffinity(0, {cpu})
+            logger.info(f"Loop multicast fissato sulla CPU {cpu}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"Impossibile fissare il loop multicast sulla CPU {cpu}: {e}")
+    
+    if hasattr(os, "sched_setscheduler"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO | os.SCHED_RESET_ON_FORK,
+                                  os.sched_param(TALLY_RT_PRIORITY))
+            logger.info(f"Loop multicast in SCHED_FIFO (priorita {TALLY_RT_PRIORITY})")
+        except OSError as e:
+            # Serve root o CAP_SYS_NICE: senza, si resta in SCHED_OTHER
+            logger.debug(f"SCHED_FIFO non disponibile: {e}")
+
+def _default_route_iface():
+    """Interfaccia della route di default letta da /proc/net/route, None se assente"""
+    try:
+        with open("/proc/net/route") as f:
+            next(f)  # Intestazione
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[1] == "00000000":
+                    return fields[0]
+    except (OSError, StopIteration):
+        pass
+    return None
+
+def _iface_ipv4(sock, ifname):
+    """Indirizzo IPv4 dell'interfaccia via ioctl SIOCGIFADDR, None se non disponibile"""
+    if fcntl is None or not ifname:
+        return None
+    try:
+        ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack('256s', ifname[:15].encode()))
+        return socket.inet_ntoa(ifreq[20:24])
+    except OSError:
+        return None
+
+def _iface_prefixlen(sock, ifname):
+    """Lunghezza del prefisso dell'interfaccia via ioctl SIOCGIFNETMASK, None se non disponibile"""
+    if fcntl is None or not ifname:
+        return None
+    try:
+        ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFNETMASK, struct.pack('256s', ifname[:15].encode()))
+        return ipaddress.IPv4Network(f"0.0.0.0/{socket.inet_ntoa(ifreq[20:24])}").prefixlen
+    except (OSError, ValueError):
+        return None
+
 def get_local_ip_and_subnet():
+    """IP locale e rete reale dell'interfaccia di default (con cache di NET_CACHE_TTL secondi)"""
+    now = time.monotonic()
+    if _netcache['ip'] is not None and now - _netcache['t'] < NET_CACHE_TTL:
+        return _netcache['ip'], _netcache['net']
+    
     try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
-        s.close()
+        ifname = _default_route_iface()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            # IP letto direttamente dall'interfaccia di default; il connect() serve solo come ripiego
+            ip = _iface_ipv4(s, ifname)
+            if ip is None:
+                s.connect(("8.8.8.8", 80))
+                ip = s.getsockname()[0]
+            prefixlen = _iface_prefixlen(s, ifname)
         
-        # Network detection for Linux
-        try:
-            if platform.system().lower() == "linux":
-                result = subprocess.check_output(
-                    ["ip", "route", "show", "default"], 
-                    universal_newlines=True,
-                    timeout=5
-                )
-                network = ipaddress.IPv4Interface(f"{ip}/24").network
-                return ip, network
-        except:
-            pass
-            
-        network = ipaddress.IPv4Interface(f"{ip}/24").network
+        # Fallback /24 se la netmask non e leggibile; reti enormi limitate per la scansione
+        if prefixlen is None:
+            prefixlen = 24
+        prefixlen = max(prefixlen, MIN_SCAN_PREFIX)
+        network = ipaddress.IPv4Interface(f"{ip}/{prefixlen}").network
+        _netcache.update(t=now, ip=ip, net=network)
         return ip, network
         
     except Exception as e:
@@ -416,8 +717,7 @@ def get_local_ip_and_subnet():
 def ping_host(ip_str):
     """Ping function optimized for threading"""
     try:
-        param = "-n" if platform.system().lower() == "windows" else "-c"
-        command = ["ping", param, "1", "-W", "200", ip_str]  # Timeout ridotto a 200ms
+        command = [*_PING_CMD_PREFIX, ip_str]
         result = subprocess.call(
             command, 
             stdout=subprocess.DEVNULL, 
@@ -428,6 +728,276 @@ def ping_host(ip_str):
     except:
         return (ip_str, False)
 
+def _icmp_checksum(data):
+    """Checksum RFC 1071 per pacchetti ICMP"""
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+ICMP_PAYLOAD = b"tally-scan"
+
+def _icmp_echo_builder(ident):
+    """Funzione seq -> pacchetto Echo Request per un ident fisso.
+    La somma di tipo, ident e payload e calcolata una volta: per ogni host si aggiunge solo seq"""
+    base = ~_icmp_checksum(struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, ident, 0) + ICMP_PAYLOAD) & 0xFFFF
+    pack = struct.Struct("!BBHHH").pack
+    
+    def build(seq):
+        total = base + seq
+        total = (total >> 16) + (total & 0xFFFF)
+        return pack(ICMP_ECHO_REQUEST, 0, ~total & 0xFFFF, ident, seq) + ICMP_PAYLOAD
+    return build
+
+def _open_icmp_socket():
+    """Apre un socket ICMP: DGRAM (ping non privilegiato Linux) o RAW (richiede CAP_NET_RAW)"""
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except OSError:
+        return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+def icmp_sweep(ip_list, timeout=1.0, source_ip=None):
+    """Ping di tutti gli IP da un unico socket ICMP, senza processi ping.
+    Con source_ip il socket e legato all'interfaccia locale della rete scansionata.
+    Ritorna la lista degli host attivi, oppure None se i socket ICMP non sono disponibili"""
+    try:
+        sock, is_raw = _open_icmp_socket()
+    except OSError as e:
+        logger.debug("Socket ICMP non disponibile: %s", e)
+        return None
+    
+    ident = os.getpid() & 0xFFFF
+    build_packet = _icmp_echo_builder(ident)
+    # Indice = numero di sequenza: target e stato di ogni host in due liste parallele
+    targets = [None]
+    answered = [True]
+    pending = 0
+    alive_hosts = []
+    
+    try:
+        sock.setblocking(False)
+        if source_ip:
+            try:
+                sock.bind((source_ip, 0))
+            except OSError as e:
+                logger.debug(f"Bind ICMP su {source_ip} fallito: {e}")
+        
+        # Invia tutte le Echo Request in sequenza
+        for seq, ip_str in enumerate(itertools.islice(ip_list, 0xFFFF), 1):
+            targets.append(ip_str)
+            answered.append(False)
+            pending += 1
+            packet = build_packet(seq)
+            try:
+                sock.sendto(packet, (ip_str, 0))
+            except (BlockingIOError, InterruptedError):
+                # Buffer di invio pieno (reti grandi): attendi che si svuoti invece di perdere l'host
+                select.select([], [sock], [], ICMP_SEND_WAIT)
+                try:
+                    sock.sendto(packet, (ip_str, 0))
+                except OSError as e:
+                    logger.debug("Errore invio ICMP a %s: %s", ip_str, e)
+            except OSError as e:
+                logger.debug("Errore invio ICMP a %s: %s", ip_str, e)
+        
+        # Raccogli le risposte fino alla scadenza globale
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                break
+            try:
+                data, addr = sock.recvfrom(1024)
+            except OSError:
+                continue
+            
+            # I socket RAW includono l'header IP
+            if is_raw:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+            
+            icmp_type, _, _, reply_ident, seq = struct.unpack("!BBHHH", data[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Con SOCK_DGRAM il kernel riscrive e filtra l'identificativo
+            if is_raw and reply_ident != ident:
+                continue
+            
+            if seq < len(targets) and not answered[seq] and targets[seq] == addr[0]:
+                answered[seq] = True
+                pending -= 1
+                alive_hosts.append(addr[0])
+    finally:
+        sock.close()
+    
+    return alive_hosts
+
+def ping_sweep(ips, total_ips, window=200):
+    """Ping parallelo tramite il comando ping di sistema (fallback).
+    Al massimo window ping in coda: memoria costante anche su reti grandi"""
+    alive_hosts = []
+    ips = iter(ips)
+    in_flight = {_SCAN_POOL.submit(ping_host, ip) for ip in itertools.islice(ips, window)}
+    
+    completed = 0
+    while in_flight:
+        # Ogni ping ha un timeout di 0.5s: nessun completamento entro PING_WAIT_TIMEOUT e un blocco
+        done, in_flight = concurrent.futures.wait(
+            in_flight, timeout=PING_WAIT_TIMEOUT, return_when=concurrent.futures.FIRST_COMPLETED)
+        if not done:
+            logger.warning(f"Timeout scansione ping ({completed}/{total_ips})")
+            for future in in_flight:
+                future.cancel()
+            break
+        
+        for future in done:
+            completed += 1
+            try:
+                ip_str, is_alive = future.result()
+                if is_alive:
+                    alive_hosts.append(ip_str)
+                    logger.info(f"Host attivo trovato: {ip_str} ({completed}/{total_ips})")
+                elif completed % 50 == 0:
+                    logger.info(f"Progresso ping: {completed}/{total_ips}")
+            except Exception as e:
+                logger.debug(f"Errore ping: {e}")
+            
+            # Sostituisci il ping completato con il prossimo IP
+            for ip in itertools.islice(ips, 1):
+                in_flight.add(_SCAN_POOL.submit(ping_host, ip))
+    
+    return alive_hosts
+
+def read_arp_table():
+    """Legge la cache ARP del kernel: ritorna dict ip -> mac, None se non disponibile"""
+    mac_map = {}
+    try:
+        with open("/proc/net/arp") as f:
+            next(f)  # Intestazione
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 4 and fields[3] != "00:00:00:00:00:00":
+                    mac_map[fields[0]] = fields[3].lower()
+    except OSError as e:
+        logger.debug(f"Cache ARP non disponibile: {e}")
+        return None
+    return mac_map
+
+def arp_sweep(ips, network, settle=0.3):
+    """Host attivi dalla cache ARP dopo un datagramma UDP a ogni IP (solo Linux).
+    Ritorna None se /proc/net/arp non e disponibile"""
+    if not os.path.exists("/proc/net/arp"):
+        return None
+    
+    # Un byte alla porta discard: il kernel risolve l'ARP di ogni host
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for ip_str in ips:
+            try:
+                sock.sendto(b"\x00", (ip_str, DISCARD_PORT))
+            except OSError:
+                pass
+    time.sleep(settle)
+    
+    mac_map = read_arp_table()
+    if mac_map is None:
+        return None
+    in_network = _network_filter(network)
+    return [ip for ip in mac_map if in_network(ip)]
+
+def atem_udp_probe(ip_str, timeout=0.2):
+    """Probe UDP veloce sulla porta ATEM: True se l'host risponde al pacchetto hello"""
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            # Socket connesso: un ICMP port-unreachable arriva come ECONNREFUSED
+            sock.connect((ip_str, ATEM_PORT))
+            sock.send(ATEM_HELLO)
+            readable, _, _ = select.select([sock], [], [], timeout)
+            if not readable:
+                return False
+            return len(sock.recv(1500)) >= 12
+    except OSError:
+        return False
+
+def atem_udp_sweep(hosts, timeout=0.3):
+    """Invia l'hello ATEM agli host (gia visti attivi) da un unico socket UDP,
+    uno ogni ATEM_HELLO_PACING. Genera gli IP nell'ordine in cui rispondono"""
+    pending = set()
+    dropped = 0
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for ip_str in hosts:
+            if pending:
+                time.sleep(ATEM_HELLO_PACING)
+            pending.add(ip_str)
+            try:
+                sock.sendto(ATEM_HELLO, (ip_str, ATEM_PORT))
+            except (BlockingIOError, InterruptedError):
+                # Buffer di invio pieno: attendi che si svuoti invece di perdere l'host
+                select.select([], [sock], [], ICMP_SEND_WAIT)
+                try:
+                    sock.sendto(ATEM_HELLO, (ip_str, ATEM_PORT))
+                except OSError as e:
+                    dropped += 1
+                    logger.debug("Hello ATEM a %s non inviato: %s", ip_str, e)
+            except OSError as e:
+                logger.debug("Errore invio hello ATEM a %s: %s", ip_str, e)
+        if dropped:
+            logger.warning(f"Hello ATEM non inviati per buffer pieno: {dropped} host")
+        
+        deadline = time.monotonic() + timeout
+        while pending:
+            # Le risposte gia ricevute restano nel buffer anche oltre la scadenza
+            remaining = max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                break
+            try:
+                data, addr = sock.recvfrom(1500)
+            except OSError:
+                continue
+            if len(data) >= 12 and addr[0] in pending:
+                pending.discard(addr[0])
+                yield addr[0]
+
+def _first_confirmed(tests, block):
+    """Primo IP con test ATEM riuscito tra quelli conclusi; con block attende tutti i test.
+    I test conclusi vengono rimossi da tests (dict future -> ip)"""
+    while tests:
+        done, _ = concurrent.futures.wait(
+            tests, timeout=None if block else 0, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            ip_str = tests.pop(future)
+            if future.result():
+                return ip_str
+        if not block:
+            break
+    return None
+
+def probe_atem_hosts(hosts, timeout=0.3):
+    """Probe UDP di tutti gli host; conferma con handshake completo solo chi risponde,
+    con piu test in parallelo. Ritorna il primo IP ATEM confermato o None"""
+    tests = {}
+    try:
+        for ip_str in atem_udp_sweep(hosts, timeout):
+            logger.info(f"Risposta ATEM da {ip_str}, verifica connessione...")
+            tests[_ATEM_TEST_POOL.submit(test_atem_connection, ip_str)] = ip_str
+            found_ip = _first_confirmed(tests, block=False)
+            if found_ip:
+                return found_ip
+        
+        return _first_confirmed(tests, block=True)
+    finally:
+        for future in tests:
+            future.cancel()
+
 def test_atem_connection(ip_str):
     """Test rapido della connessione ATEM"""
     try:
@@ -441,12 +1011,52 @@ def test_atem_connection(ip_str):
         logger.debug(f"Test connessione ATEM fallito per {ip_str}: {e}")
         return False
 
+_PACK_IPV4 = struct.Struct("!I").pack
+_UNPACK_IPV4 = struct.Struct("!I").unpack
+
+def _network_filter(network):
+    """Funzione ip_str -> True se l'indirizzo e dentro network.
+    Confronto tra interi con la maschera, senza creare un IPv4Address per ogni IP"""
+    net = int(network.network_address)
+    mask = int(network.netmask)
+    unpack = _UNPACK_IPV4
+    
+    def in_network(ip_str):
+        try:
+            return unpack(socket.inet_aton(ip_str))[0] & mask == net
+        except OSError:
+            return False
+    return in_network
+
+def _iter_hosts(network):
+    """IP host della rete come stringhe, generati uno alla volta.
+    Conversione da intero con inet_ntoa: molto piu rapida di str(IPv4Address)"""
+    if network.num_addresses <= 2:
+        # /31 e /32 non hanno indirizzi di rete/broadcast da escludere
+        return (str(ip) for ip in network.hosts())
+    first = int(network.network_address) + 1
+    last = int(network.broadcast_address)
+    return (socket.inet_ntoa(_PACK_IPV4(n)) for n in range(first, last))
+
+def _blackmagic_first(hosts, mac_map):
+    """Host con MAC Blackmagic Design (cache ARP) in testa, gli altri nell'ordine originale"""
+    return sorted(hosts, key=lambda ip: not mac_map.get(ip, "").startswith(BLACKMAGIC_OUIS))
+
+def _known_hosts(network):
+    """Host della rete gia noti: attivi all'ultima scansione, poi quelli nella cache ARP"""
+    in_network = _network_filter(network)
+    known = [ip for ip in config.get('known_alive_ips', []) if in_network(ip)]
+    mac_map = read_arp_table() or {}
+    known.extend(ip for ip in mac_map if in_network(ip))
+    return _blackmagic_first(dict.fromkeys(known), mac_map)  # Senza duplicati
+
 def find_atem(network, force_scan=False):
     """Find ATEM on network with option to force full scan"""
     global ATEM_IP, scan_in_progress
     
     scan_in_progress = True
     system_stats['scan_requests'] += 1
+    config_changed = False
     
     try:
         logger.info(f"Ricerca ATEM sulla rete {network}")
@@ -454,7 +1064,8 @@ def find_atem(network, force_scan=False):
         # First check if we have a known working IP (unless forced)
         if not force_scan and ATEM_IP:
             logger.info(f"Test IP precedentemente salvato: {ATEM_IP}")
-            if test_atem_connection(ATEM_IP):
+            # Probe UDP da 200ms prima dell'handshake completo: un IP morto non costa ATEM_TIMEOUT
+            if atem_udp_probe(ATEM_IP) and test_atem_connection(ATEM_IP):
                 logger.info(f"ATEM confermato su IP salvato: {ATEM_IP}")
                 config['last_successful_ip'] = ATEM_IP
                 save_config(config)
@@ -462,56 +1073,105 @@ def find_atem(network, force_scan=False):
             else:
                 logger.info("IP salvato non risponde, avvio scansione completa")
         
-        # Phase 1: Parallel ping scan
-        logger.info("Fase 1: Scansione ping parallela...")
+        # IP generati al volo da network.hosts(): nessuna lista di tutta la rete
+        total_ips = max(network.num_addresses - 2, 1)
         
-        alive_hosts = []
-        all_ips = [str(ip) for ip in network.hosts()]
-        total_ips = len(all_ips)
-        logger.info(f"Scansione {total_ips} IP in parallelo...")
+        # Phase 0: host gia noti (scansioni precedenti e cache ARP), senza toccare il resto della rete
+        known_hosts = _known_hosts(network)
+        found_ip = None
+        if known_hosts:
+            logger.info(f"Fase 0: Probe ATEM su {len(known_hosts)} host noti...")
+            found_ip = probe_atem_hosts(known_hosts)
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=100) as executor:
-            future_to_ip = {executor.submit(ping_host, ip): ip for ip in all_ips}
+        if not found_ip:
+            # Phase 1: host attivi dalla cache ARP (o ICMP), poi probe ATEM solo su quelli:
+            # nessun hello ATEM agli indirizzi mai visti attivi
+            logger.info("Fase 1: Ricerca host attivi...")
             
-            completed = 0
-            for future in concurrent.futures.as_completed(future_to_ip, timeout=10):
-                completed += 1
-                try:
-                    ip_str, is_alive = future.result()
-                    if is_alive:
-                        alive_hosts.append(ip_str)
-                        logger.info(f"Host attivo trovato: {ip_str} ({completed}/{total_ips})")
-                    elif completed % 50 == 0:
-                        logger.info(f"Progresso ping: {completed}/{total_ips}")
-                except Exception as e:
-                    logger.debug(f"Errore ping: {e}")
-        
-        logger.info(f"Ping completato. Host attivi: {len(alive_hosts)}")
-        
-        if not alive_hosts:
-            logger.warning("Nessun host risponde al ping")
-            return False
-        
-        # Phase 2: Test ATEM on alive hosts
-        logger.info("Fase 2: Test ATEM sugli host attivi...")
-        
-        for i, ip_str in enumerate(alive_hosts, 1):
-            logger.info(f"Test ATEM {i}/{len(alive_hosts)}: {ip_str}")
+            alive_hosts = arp_sweep(_iter_hosts(network), network)
+            if not alive_hosts:
+                # Nessuna cache ARP utilizzabile: ICMP sweep da un unico socket,
+                # uscita dall'interfaccia locale su quella rete
+                local_ip, _ = get_local_ip_and_subnet()
+                if local_ip and ipaddress.IPv4Address(local_ip) not in network:
+                    local_ip = None
+                alive_hosts = icmp_sweep(_iter_hosts(network), source_ip=local_ip)
+                if alive_hosts is None:
+                    logger.info("Socket ICMP non disponibile, uso il comando ping")
+                    alive_hosts = ping_sweep(_iter_hosts(network), total_ips)
             
-            if test_atem_connection(ip_str):
-                ATEM_IP = ip_str
-                config['atem_ip'] = ATEM_IP
-                config['last_successful_ip'] = ATEM_IP
-                save_config(config)
-                logger.info(f"ATEM trovato e salvato: {ATEM_IP}")
-                return True
+            logger.info(f"Ping completato. Host attivi: {len(alive_hosts)}")
+            
+            if not alive_hosts:
+                logger.warning("Nessun host risponde al ping")
+                return False
+            
+            # Ricordati degli host attivi: alla prossima scansione vengono provati per primi
+            known_alive_ips = alive_hosts[:MAX_KNOWN_HOSTS]
+            if known_alive_ips != config.get('known_alive_ips'):
+                config['known_alive_ips'] = known_alive_ips
+                config_changed = True
+            
+            # Gli host gia provati in fase 0 non ricevono un secondo hello
+            tried = set(known_hosts)
+            candidates = _blackmagic_first(
+                (ip for ip in alive_hosts if ip not in tried), read_arp_table() or {})
+            logger.info(f"Fase 1: Probe ATEM su {len(candidates)} host attivi...")
+            found_ip = probe_atem_hosts(candidates)
+        
+        if found_ip:
+            ATEM_IP = found_ip
+            config['atem_ip'] = ATEM_IP
+            config['last_successful_ip'] = ATEM_IP
+            save_config(config)
+            logger.info(f"ATEM trovato e salvato: {ATEM_IP}")
+            return True
         
         logger.warning("Nessun ATEM trovato tra gli host attivi")
+        if config_changed:
+            save_config(config)  # Scansioni periodiche: scrivi su SD solo se qualcosa e cambiato
         return False
         
     finally:
         scan_in_progress = False
 
+def discovery_worker_thread_func():
+    """Ricerca ATEM in background finche il lettore non e connesso: host noti ogni
+    DISCOVERY_LIVE_INTERVAL, scansione completa ogni DISCOVERY_FULL_INTERVAL"""
+    global ATEM_IP
+    set_idle_priority()
+    last_full_scan = time.monotonic()
+    
+    while True:
+        time.sleep(DISCOVERY_LIVE_INTERVAL)
+        if atem_manager.connected or scan_in_progress:
+            continue
+        
+        try:
+            local_ip, network = get_local_ip_and_subnet()
+            if not local_ip:
+                continue
+            
+            known_hosts = _known_hosts(network)
+            now = time.monotonic()
+            if not known_hosts or now - last_full_scan >= DISCOVERY_FULL_INTERVAL:
+                # find_atem prova comunque prima gli host noti
+                last_full_scan = now
+                logger.info("Ricerca ATEM in background: scansione completa")
+                if find_atem(network, force_scan=True):
+                    reader_request_queue.put(False)
+                continue
+            
+            found_ip = probe_atem_hosts(known_hosts)
+            if found_ip and found_ip != ATEM_IP:
+                logger.info(f"Ricerca ATEM in background: ATEM trovato su {found_ip}")
+                ATEM_IP = found_ip
+                config['atem_ip'] = found_ip
+                config['last_successful_ip'] = found_ip
+                reader_request_queue.put(True)
+        except Exception as e:
+            logger.error(f"Errore ricerca ATEM in background: {e}")
+
 def setWifiMode(ap_mode=False):
     """Set WiFi mode (AP or Station)"""
     global wifi_mode_ap
@@ -539,210 +1199,258 @@ def setWifiMode(ap_mode=False):
     except Exception as e:
         logger.error(f"Errore WiFi script: {e}")
         return False
+    finally:
+        # Cambiando modalita cambiano IP e rete: la cache non e piu valida
+        _netcache['ip'] = None
+
+def wifi_worker_thread_func():
+    """Esegue i cambi di modalita WiFi fuori dal thread HTTP (lo script puo durare 10s)"""
+    while True:
+        ap_mode = wifi_request_queue.get()
+        try:
+            setWifiMode(ap_mode=ap_mode)
+        except Exception as e:
+            logger.error(f"Errore cambio modalita WiFi: {e}")
+
+def reader_worker_thread_func():
+    """Salva la config e riavvia il lettore fuori dal thread HTTP.
+    Le richieste ravvicinate (entro CONFIG_DEBOUNCE) producono un solo salvataggio e riavvio"""
+    while True:
+        save = reader_request_queue.get()
+        while True:
+            try:
+                save = reader_request_queue.get(timeout=CONFIG_DEBOUNCE) or save
+            except queue.Empty:
+                break
+        try:
+            if save:
+                save_config(config)
+            restart_atem_reader()
+        except Exception as e:
+            logger.error(f"Errore riavvio lettore ATEM: {e}")
 
 # =======================================================
 # Enhanced Web Server
 # =======================================================
-class ConfigHandler(BaseHTTPRequestHandler):
-    def log_message(self, format, *args):
-        pass  # Suppress HTTP server logs
-        
-    def do_GET(self):
-        """Handle GET requests"""
-        if self.path == "/api/status":
-            # JSON API endpoint for status
-            system_info = get_system_info()
-            status_data = {
-                'atem': atem_status,
-                'tally_state': dict_state,
-                'wifi_ap': wifi_mode_ap,
-                'scan_in_progress': scan_in_progress,
-                'system': system_info,
-                'config': {
-                    'current_atem_ip': ATEM_IP,
-                    'last_successful_ip': config.get('last_successful_ip'),
-                    'wifi_ap_mode': wifi_mode_ap
-                }
-            }
+# Pagina principale, riempita con str.format_map
+# Risorse statiche servite a parte: il browser le tiene in cache, la pagina resta piccola
+_STYLE_CSS = """\
+body { font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }
+.container { max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }
+.header { text-align: center; color: #333; margin-bottom: 30px; }
+.status-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin-bottom: 30px; }
+.status-card { background: #f8f9fa; padding: 15px; border-radius: 6px; border-left: 4px solid #007bff; }
+.status-value { font-size: 18px; font-weight: bold; margin-top: 5px; }
+.status-green { color: green; }
+.status-red { color: red; }
+.status-orange { color: orange; }
+.status-blue { color: blue; }
+.status-gray { color: gray; }
+.form-section { background: #f8f9fa; padding: 20px; border-radius: 6px; margin-bottom: 20px; }
+.form-group { margin-bottom: 15px; }
+.form-group label { display: block; margin-bottom: 5px; font-weight: bold; }
+.form-group input[type="text"] { width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px; box-sizing: border-box; }
+.form-group input[type="checkbox"] { margin-right: 8px; }
+.btn { padding: 10px 20px; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; margin-right: 10px; margin-bottom: 10px; }
+.btn-primary { background-color: #007bff; color: white; }
+.btn-success { background-color: #28a745; color: white; }
+.btn-warning { background-color: #ffc107; color: black; }
+.btn-danger { background-color: #dc3545; color: white; }
+.btn:hover { opacity: 0.8; }
+.btn:disabled { opacity: 0.5; cursor: not-allowed; }
+.tally-display { display: flex; gap: 10px; flex-wrap: wrap; margin-top: 10px; }
+.tally-indicator { width: 60px; height: 40px; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; border-radius: 4px; }
+.tally-live { background-color: red; }
+.tally-preview { background-color: green; }
+.tally-clear { background-color: gray; }
+.log-section { background: #f8f9fa; padding: 15px; border-radius: 6px; margin-top: 20px; }
+.refresh-info { font-size: 12px; color: #666; text-align: center; margin-top: 20px; }
+.debug-info { font-size: 11px; color: #888; margin-top: 5px; }
+.alert { padding: 10px; background-color: #f44336; color: white; margin-bottom: 15px; border-radius: 4px; }
+.alert.warning { background-color: #ff9800; }
+.alert.info { background-color: #2196F3; }
+@keyframes pulse {
+    0% { opacity: 1; }
+    50% { opacity: 0.5; }
+    100% { opacity: 1; }
+}
+.pulse { animation: pulse 1s infinite; }
+"""
+
+_APP_JS = """\
+let statusUpdateInterval;
+
+function updateStatus() {
+    fetch('/api/status')
+        .then(response => response.json())
+        .then(data => {
+            // Aggiorna display tally
+            updateTallyDisplay(data.tally_state, data.atem);
             
-            self.send_response(200)
-            self.send_header("Content-type", "application/json")
-            self.send_header("Access-Control-Allow-Origin", "*")
-            self.end_headers()
-            self.wfile.write(json.dumps(status_data, indent=2).encode('utf-8'))
-            return
-        
-        # Main web interface
-        system_info = get_system_info()
-        
-        # Status indicators with colors
-        atem_status_color = "green" if atem_status['connected'] else "red"
-        atem_status_text = "Connesso" if atem_status['connected'] else "Disconnesso"
-        
-        if atem_status.get('reconnect_in_progress'):
-            atem_status_text = "Riconnessione..."
-            atem_status_color = "orange"
-        
-        wifi_status_color = "orange" if wifi_mode_ap else "blue"
-        wifi_status_text = "Access Point" if wifi_mode_ap else "Station Mode"
-        
-        scan_status = "IN CORSO..." if scan_in_progress else "Pronto"
-        scan_button_disabled = "disabled" if scan_in_progress else ""
+            // Aggiorna stato connessione
+            updateConnectionStatus(data.atem, data.config);
+            
+            // Aggiorna freshness dati
+            updateDataFreshness(data.atem.last_data_time);
+            
+            // Aggiorna WiFi, sistema e statistiche
+            updateWifiStatus(data.wifi_ap);
+            updateSystemInfo(data.system, data.atem, data.reader_thread_alive);
+            
+            const scanButton = document.getElementById('scan-button');
+            if (scanButton) scanButton.disabled = data.scan_in_progress;
+        })
+        .catch(error => {
+            console.error('Error updating status:', error);
+        });
+}
+
+function setText(id, text) {
+    const el = document.getElementById(id);
+    if (el) el.textContent = text;
+}
+
+function updateTallyDisplay(state, atem) {
+    setText('live-value', state.Live || '-');
+    setText('preview-value', state.Preview || '-');
+    setText('active-text', state.isActive ? 'Sì' : 'No');
+    setText('last-reading', `${atem.last_live ?? 'N/A'} / ${atem.last_preview ?? 'N/A'}`);
+}
+
+function updateConnectionStatus(atem, config) {
+    setText('atem-ip', atem.ip || config.current_atem_ip || 'N/A');
+    setText('last-error', atem.last_error ? `Errore: ${atem.last_error}` : '');
+    document.querySelectorAll('.data-updates').forEach(el => el.textContent = atem.data_updates);
+    
+    const alertEl = document.getElementById('atem-alert');
+    if (alertEl) {
+        if (atem.reconnect_in_progress) {
+            alertEl.textContent = '⚠️ Riconnessione ATEM in corso...';
+            alertEl.className = 'alert warning';
+        } else if (!atem.connected) {
+            alertEl.textContent = '❌ ATEM disconnesso - verificare connessione';
+            alertEl.className = 'alert';
+        } else {
+            alertEl.textContent = '';
+            alertEl.className = '';
+        }
+    }
+    
+    const statusEl = document.getElementById('connection-status');
+    if (statusEl) {
+        if (atem.connected) {
+            statusEl.textContent = 'Connesso';
+            statusEl.className = 'status-value status-green';
+        } else if (atem.reconnect_in_progress) {
+            statusEl.textContent = 'Riconnessione...';
+            statusEl.className = 'status-value status-orange pulse';
+        } else {
+            statusEl.textContent = 'Disconnesso';
+            statusEl.className = 'status-value status-red';
+        }
+    }
+}
+
+function updateDataFreshness(lastDataTime) {
+    const freshnessEl = document.getElementById('data-freshness');
+    if (freshnessEl && !lastDataTime) {
+        freshnessEl.textContent = 'N/A';
+        freshnessEl.className = 'status-value status-gray';
+    } else if (freshnessEl) {
+        const age = Date.now()/1000 - lastDataTime;
+        let text, className;
         
-        # Calcola freshness dei dati
-        data_status = "N/A"
-        data_color = "gray"
-        if atem_status.get('last_data_time'):
-            age = time.time() - atem_status['last_data_time']
-            if age < 2:
-                data_status = "Tempo reale"
-                data_color = "green"
-            elif age < 10:
-                data_status = f"Aggiornato {age:.1f}s fa"
-                data_color = "orange"
-            else:
-                data_status = f"OBSOLETO ({age:.0f}s fa)"
-                data_color = "red"
+        if (age < 2) {
+            text = 'Tempo reale';
+            className = 'status-green';
+        } else if (age < 10) {
+            text = `Aggiornato ${age.toFixed(1)}s fa`;
+            className = 'status-orange';
+        } else {
+            text = `OBSOLETO (${age.toFixed(0)}s fa)`;
+            className = 'status-red';
+        }
         
-        html = f"""
+        freshnessEl.textContent = text;
+        freshnessEl.className = 'status-value ' + className;
+    }
+}
+
+function updateWifiStatus(apMode) {
+    const wifiEl = document.getElementById('wifi-status');
+    if (wifiEl) {
+        wifiEl.textContent = apMode ? 'Access Point' : 'Station Mode';
+        wifiEl.className = 'status-value ' + (apMode ? 'status-orange' : 'status-blue');
+    }
+}
+
+function updateSystemInfo(system, atem, readerAlive) {
+    setText('uptime', system.uptime);
+    setText('cpu-temp', system.cpu_temp);
+    setText('memory-usage', system.memory_usage);
+    setText('total-packets-sent', system.total_packets_sent);
+    setText('reconnections', system.reconnections);
+    setText('scan-requests', system.scan_requests);
+    setText('connection-attempts', atem.connection_attempts);
+    setText('reader-thread', readerAlive ? 'Attivo' : 'Non attivo');
+    
+    const lastConnEl = document.getElementById('last-connection');
+    if (lastConnEl) {
+        lastConnEl.innerHTML = atem.last_connection_time
+            ? '<strong>Ultima connessione:</strong> ' + atem.last_connection_time : '';
+    }
+}
+
+function confirmScan() {
+    return confirm('Avviare la scansione della rete per cercare ATEM? Questo potrebbe richiedere alcuni minuti.');
+}
+
+function restartReader() {
+    if (confirm('Riavviare il lettore ATEM? Questo forzerà una riconnessione.')) {
+        fetch('/api/restart_reader', { method: 'POST' })
+            .then(() => alert('Lettore ATEM riavviato'))
+            .catch(error => alert('Errore: ' + error));
+    }
+}
+
+// Avvia aggiornamento automatico
+window.onload = function() {
+    updateStatus();
+    statusUpdateInterval = setInterval(updateStatus, 1000);  // Ogni secondo
+};
+
+window.onunload = function() {
+    if (statusUpdateInterval) {
+        clearInterval(statusUpdateInterval);
+    }
+};
+"""
+
+def _etag(body):
+    """ETag forte calcolato dal contenuto"""
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+def _static_entry(text, content_type):
+    """(body, content-type, ETag) per una risorsa statica, codificata una sola volta"""
+    body = text.encode("utf-8")
+    return body, content_type, _etag(body)
+
+_STATIC_FILES = {
+    "/static/style.css": _static_entry(_STYLE_CSS, "text/css; charset=utf-8"),
+    "/static/app.js": _static_entry(_APP_JS, "application/javascript; charset=utf-8"),
+}
+HTTP_KEEPALIVE_TIMEOUT = 30  # Secondi di inattivita prima di chiudere una connessione keep-alive
+STATIC_MAX_AGE = 86400  # Secondi di cache del browser per CSS/JS
+
+_PAGE_TEMPLATE = """
         <!DOCTYPE html>
         <html>
         <head>
             <title>Tally System Controller</title>
             <meta name="viewport" content="width=device-width, initial-scale=1">
             <meta charset="utf-8">
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; background-color: #f5f5f5; }}
-                .container {{ max-width: 800px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); }}
-                .header {{ text-align: center; color: #333; margin-bottom: 30px; }}
-                .status-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; margin-bottom: 30px; }}
-                .status-card {{ background: #f8f9fa; padding: 15px; border-radius: 6px; border-left: 4px solid #007bff; }}
-                .status-value {{ font-size: 18px; font-weight: bold; margin-top: 5px; }}
-                .status-green {{ color: green; }}
-                .status-red {{ color: red; }}
-                .status-orange {{ color: orange; }}
-                .status-blue {{ color: blue; }}
-                .status-gray {{ color: gray; }}
-                .form-section {{ background: #f8f9fa; padding: 20px; border-radius: 6px; margin-bottom: 20px; }}
-                .form-group {{ margin-bottom: 15px; }}
-                .form-group label {{ display: block; margin-bottom: 5px; font-weight: bold; }}
-                .form-group input[type="text"] {{ width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px; box-sizing: border-box; }}
-                .form-group input[type="checkbox"] {{ margin-right: 8px; }}
-                .btn {{ padding: 10px 20px; border: none; border-radius: 4px; cursor: pointer; font-size: 14px; margin-right: 10px; margin-bottom: 10px; }}
-                .btn-primary {{ background-color: #007bff; color: white; }}
-                .btn-success {{ background-color: #28a745; color: white; }}
-                .btn-warning {{ background-color: #ffc107; color: black; }}
-                .btn-danger {{ background-color: #dc3545; color: white; }}
-                .btn:hover {{ opacity: 0.8; }}
-                .btn:disabled {{ opacity: 0.5; cursor: not-allowed; }}
-                .tally-display {{ display: flex; gap: 10px; flex-wrap: wrap; margin-top: 10px; }}
-                .tally-indicator {{ width: 60px; height: 40px; display: flex; align-items: center; justify-content: center; color: white; font-weight: bold; border-radius: 4px; }}
-                .tally-live {{ background-color: red; }}
-                .tally-preview {{ background-color: green; }}
-                .tally-clear {{ background-color: gray; }}
-                .log-section {{ background: #f8f9fa; padding: 15px; border-radius: 6px; margin-top: 20px; }}
-                .refresh-info {{ font-size: 12px; color: #666; text-align: center; margin-top: 20px; }}
-                .debug-info {{ font-size: 11px; color: #888; margin-top: 5px; }}
-                .alert {{ padding: 10px; background-color: #f44336; color: white; margin-bottom: 15px; border-radius: 4px; }}
-                .alert.warning {{ background-color: #ff9800; }}
-                .alert.info {{ background-color: #2196F3; }}
-                @keyframes pulse {{
-                    0% {{ opacity: 1; }}
-                    50% {{ opacity: 0.5; }}
-                    100% {{ opacity: 1; }}
-                }}
-                .pulse {{ animation: pulse 1s infinite; }}
-            </style>
-            <script>
-                let statusUpdateInterval;
-                
-                function updateStatus() {{
-                    fetch('/api/status')
-                        .then(response => response.json())
-                        .then(data => {{
-                            // Aggiorna display tally
-                            updateTallyDisplay(data.tally_state);
-                            
-                            // Aggiorna stato connessione
-                            updateConnectionStatus(data.atem);
-                            
-                            // Aggiorna freshness dati
-                            updateDataFreshness(data.atem.last_data_time);
-                        }})
-                        .catch(error => {{
-                            console.error('Error updating status:', error);
-                        }});
-                }}
-                
-                function updateTallyDisplay(state) {{
-                    const liveEl = document.getElementById('live-value');
-                    const previewEl = document.getElementById('preview-value');
-                    if (liveEl) liveEl.textContent = state.Live || '-';
-                    if (previewEl) previewEl.textContent = state.Preview || '-';
-                }}
-                
-                function updateConnectionStatus(atem) {{
-                    const statusEl = document.getElementById('connection-status');
-                    if (statusEl) {{
-                        if (atem.connected) {{
-                            statusEl.textContent = 'Connesso';
-                            statusEl.className = 'status-value status-green';
-                        }} else if (atem.reconnect_in_progress) {{
-                            statusEl.textContent = 'Riconnessione...';
-                            statusEl.className = 'status-value status-orange pulse';
-                        }} else {{
-                            statusEl.textContent = 'Disconnesso';
-                            statusEl.className = 'status-value status-red';
-                        }}
-                    }}
-                }}
-                
-                function updateDataFreshness(lastDataTime) {{
-                    const freshnessEl = document.getElementById('data-freshness');
-                    if (freshnessEl && lastDataTime) {{
-                        const age = Date.now()/1000 - lastDataTime;
-                        let text, className;
-                        
-                        if (age < 2) {{
-                            text = 'Tempo reale';
-                            className = 'status-green';
-                        }} else if (age < 10) {{
-                            text = `Aggiornato ${{age.toFixed(1)}}s fa`;
-                            className = 'status-orange';
-                        }} else {{
-                            text = `OBSOLETO (${{age.toFixed(0)}}s fa)`;
-                            className = 'status-red';
-                        }}
-                        
-                        freshnessEl.textContent = text;
-                        freshnessEl.className = className;
-                    }}
-                }}
-                
-                function confirmScan() {{
-                    return confirm('Avviare la scansione della rete per cercare ATEM? Questo potrebbe richiedere alcuni minuti.');
-                }}
-                
-                function restartReader() {{
-                    if (confirm('Riavviare il lettore ATEM? Questo forzerà una riconnessione.')) {{
-                        fetch('/api/restart_reader', {{ method: 'POST' }})
-                            .then(() => alert('Lettore ATEM riavviato'))
-                            .catch(error => alert('Errore: ' + error));
-                    }}
-                }}
-                
-                // Avvia aggiornamento automatico
-                window.onload = function() {{
-                    updateStatus();
-                    statusUpdateInterval = setInterval(updateStatus, 1000);  // Ogni secondo
-                }};
-                
-                window.onunload = function() {{
-                    if (statusUpdateInterval) {{
-                        clearInterval(statusUpdateInterval);
-                    }}
-                }};
-            </script>
+            <link rel="stylesheet" href="/static/style.css">
+            <script src="/static/app.js"></script>
         </head>
         <body>
             <div class="container">
@@ -752,36 +1460,35 @@ class ConfigHandler(BaseHTTPRequestHandler):
                     <p>Sistema di controllo tally per mixer ATEM - v3.0 FIXED</p>
                 </div>
                 
-                {'<div class="alert warning">⚠️ Riconnessione ATEM in corso...</div>' if atem_status.get('reconnect_in_progress') else ''}
-                {'<div class="alert">❌ ATEM disconnesso - verificare connessione</div>' if not atem_status['connected'] and not atem_status.get('reconnect_in_progress') else ''}
+                <div id="atem-alert"></div>
                 
                 <div class="status-grid">
                     <div class="status-card">
                         <div>Stato ATEM</div>
-                        <div id="connection-status" class="status-value status-{atem_status_color.lower()} {'pulse' if atem_status.get('reconnect_in_progress') else ''}">{atem_status_text}</div>
-                        <small>IP: {atem_status['ip'] or ATEM_IP or 'N/A'}<br>
-                        Aggiornamenti: {atem_status.get('data_updates', 0)}</small>
-                        {f'<br><small style="color:red">Errore: {atem_status["last_error"]}</small>' if atem_status.get('last_error') else ''}
+                        <div id="connection-status" class="status-value"></div>
+                        <small>IP: <span id="atem-ip"></span><br>
+                        Aggiornamenti: <span class="data-updates"></span></small>
+                        <br><small id="last-error" style="color:red"></small>
                     </div>
                     
                     <div class="status-card">
                         <div>Freshness Dati</div>
-                        <div id="data-freshness" class="status-value status-{data_color}">{data_status}</div>
+                        <div id="data-freshness" class="status-value"></div>
                         <small>Stato aggiornamento dati ATEM</small>
                     </div>
                     
                     <div class="status-card">
                         <div>Modalità WiFi</div>
-                        <div class="status-value status-{wifi_status_color.lower()}">{wifi_status_text}</div>
+                        <div id="wifi-status" class="status-value"></div>
                         <small>Configurazione di rete attuale</small>
                     </div>
                     
                     <div class="status-card">
                         <div>Sistema</div>
                         <div class="status-value status-green">Online</div>
-                        <small>Uptime: {system_info['uptime']}<br>
-                        CPU: {system_info['cpu_temp']}<br>
-                        RAM: {system_info['memory_usage']}</small>
+                        <small>Uptime: <span id="uptime"></span><br>
+                        CPU: <span id="cpu-temp"></span><br>
+                        RAM: <span id="memory-usage"></span></small>
                     </div>
                 </div>
                 
@@ -790,22 +1497,22 @@ class ConfigHandler(BaseHTTPRequestHandler):
                     <form method="POST">
                         <div class="form-group">
                             <label for="atem_ip">Indirizzo IP ATEM:</label>
-                            <input type="text" id="atem_ip" name="atem_ip" value="{ATEM_IP or ''}" 
+                            <input type="text" id="atem_ip" name="atem_ip" value="{atem_ip_value}" 
                                    placeholder="es. 192.168.2.200" pattern="^(?:[0-9]{{1,3}}\\.?){{4}}$">
-                            <small>IP attuale: {ATEM_IP or 'Non configurato'}</small>
-                            {f'<br><small>Ultimo IP funzionante: {config.get("last_successful_ip", "Nessuno")}</small>' if config.get("last_successful_ip") else ''}
+                            <small>IP attuale: {atem_ip_current}</small>
+                            {last_successful_html}
                         </div>
                         
                         <div class="form-group">
                             <label>
-                                <input type="checkbox" name="wifi_ap" {'checked' if wifi_mode_ap else ''}>
+                                <input type="checkbox" name="wifi_ap" {wifi_checked}>
                                 Abilita modalità Access Point WiFi
                             </label>
                             <small>Crea una rete WiFi dedicata per i dispositivi tally</small>
                         </div>
                         
                         <button type="submit" class="btn btn-primary">Salva Configurazione</button>
-                        <button type="submit" name="action" value="scan" class="btn btn-warning" {scan_button_disabled} 
+                        <button type="submit" id="scan-button" name="action" value="scan" class="btn btn-warning" {scan_button_disabled} 
                                 onclick="return confirmScan()">Ricerca ATEM</button>
                         <button type="button" onclick="restartReader()" class="btn btn-danger">Riavvia Lettore</button>
                         <button type="button" onclick="location.reload()" class="btn btn-success">Aggiorna Pagina</button>
@@ -815,31 +1522,31 @@ class ConfigHandler(BaseHTTPRequestHandler):
                 <div class="status-card">
                     <h3>Stato Tally Corrente</h3>
                     <div class="tally-display">
-                        <div class="tally-indicator tally-live">LIVE<br><span id="live-value">{dict_state['Live'] if dict_state['Live'] > 0 else '-'}</span></div>
-                        <div class="tally-indicator tally-preview">PVW<br><span id="preview-value">{dict_state['Preview'] if dict_state['Preview'] > 0 else '-'}</span></div>
+                        <div class="tally-indicator tally-live">LIVE<br><span id="live-value"></span></div>
+                        <div class="tally-indicator tally-preview">PVW<br><span id="preview-value"></span></div>
                     </div>
                     <div class="debug-info" style="margin-top: 10px;">
-                        Sistema Attivo: {'Sì' if dict_state['isActive'] else 'No'}<br>
-                        Ultima lettura: {atem_status.get('last_live', 'N/A')} / {atem_status.get('last_preview', 'N/A')}<br>
-                        Totale aggiornamenti: {atem_status.get('data_updates', 0)}
+                        Sistema Attivo: <span id="active-text"></span><br>
+                        Ultima lettura: <span id="last-reading"></span><br>
+                        Totale aggiornamenti: <span class="data-updates"></span>
                     </div>
                 </div>
                 
                 <div class="status-card">
                     <h3>Statistiche Sistema</h3>
-                    <div><strong>Pacchetti multicast inviati:</strong> {system_info['total_packets_sent']}</div>
-                    <div><strong>Riconnessioni totali:</strong> {system_info['reconnections']}</div>
-                    <div><strong>Scansioni rete:</strong> {system_info['scan_requests']}</div>
-                    <div><strong>Tentativi connessione:</strong> {atem_status['connection_attempts']}</div>
-                    {f'<div><strong>Ultima connessione:</strong> {atem_status["last_connection_time"]}</div>' if atem_status.get('last_connection_time') else ''}
+                    <div><strong>Pacchetti multicast inviati:</strong> <span id="total-packets-sent"></span></div>
+                    <div><strong>Riconnessioni totali:</strong> <span id="reconnections"></span></div>
+                    <div><strong>Scansioni rete:</strong> <span id="scan-requests"></span></div>
+                    <div><strong>Tentativi connessione:</strong> <span id="connection-attempts"></span></div>
+                    <div id="last-connection"></div>
                 </div>
                 
                 <div class="log-section">
                     <h4>Informazioni Tecniche</h4>
-                    <p><strong>Multicast:</strong> {MCAST_GRP}:{MCAST_PORT}</p>
-                    <p><strong>Intervallo invio:</strong> {TallySendInterval}s</p>
-                    <p><strong>Thread lettore ATEM:</strong> {'Attivo' if atem_reader_thread and atem_reader_thread.is_alive() else 'Non attivo'}</p>
-                    <p><strong>File configurazione:</strong> {CONFIG_FILE}</p>
+                    <p><strong>Multicast:</strong> {mcast_grp}:{mcast_port}</p>
+                    <p><strong>Intervallo invio:</strong> {send_interval}s</p>
+                    <p><strong>Thread lettore ATEM:</strong> <span id="reader-thread"></span></p>
+                    <p><strong>File configurazione:</strong> {config_file}</p>
                 </div>
                 
                 <div class="refresh-info">
@@ -849,41 +1556,167 @@ class ConfigHandler(BaseHTTPRequestHandler):
             </div>
         </body>
         </html>"""
+
+def _compile_template(template):
+    """Divide il template in (testo gia codificato UTF-8, campo) una sola volta all'avvio"""
+    return tuple((literal.encode("utf-8"), field) for literal, field, _, _ in string.Formatter().parse(template))
+
+_PAGE_PARTS = _compile_template(_PAGE_TEMPLATE)
+_page_cache = (None, None, None)  # (stato, bytes, ETag) dell'ultima pagina, sostituito in blocco
+
+def render_page():
+    """Renderizza la pagina principale come (html, ETag); riusa la cache se la configurazione non e cambiata.
+    Lo stato dinamico non e nella pagina: lo compila il JavaScript da /api/status"""
+    global _page_cache
+    last_successful_ip = config.get("last_successful_ip")
+    
+    page_data = {
+        'atem_ip_value': ATEM_IP or '',
+        'atem_ip_current': ATEM_IP or 'Non configurato',
+        'last_successful_html': f'<br><small>Ultimo IP funzionante: {last_successful_ip}</small>' if last_successful_ip else '',
+        'wifi_checked': 'checked' if wifi_mode_ap else '',
+        'scan_button_disabled': "disabled" if scan_in_progress else "",
+        'mcast_grp': MCAST_GRP,
+        'mcast_port': MCAST_PORT,
+        'send_interval': TallySendInterval,
+        'config_file': CONFIG_FILE,
+    }
+    
+    key = tuple(page_data.values())
+    cached_key, cached_html, cached_etag = _page_cache
+    if key == cached_key:
+        return cached_html, cached_etag
+    
+    # Solo i valori dinamici vengono codificati, il testo fisso e gia in bytes
+    parts = []
+    for literal, field in _PAGE_PARTS:
+        parts.append(literal)
+        if field is not None:
+            parts.append(str(page_data[field]).encode("utf-8"))
+    html = b"".join(parts)
+    etag = _etag(html)  # Calcolato una volta per versione della pagina
+    _page_cache = (key, html, etag)
+    return html, etag
+
+def _qget(body, key):
+    """Valore decodificato di un campo del form urlencoded, None se assente.
+    Il form ha pochi campi noti: cerca la chiave nei bytes senza costruire il dict di parse_qs"""
+    prefix = key + b"="
+    if body.startswith(prefix):
+        start = len(prefix)
+    else:
+        i = body.find(b"&" + prefix)
+        if i < 0:
+            return None
+        start = i + 1 + len(prefix)
+    end = body.find(b"&", start)
+    value = body[start:end] if end >= 0 else body[start:]
+    return urllib.parse.unquote_plus(value.decode("ascii", "replace"))
+
+class ConfigHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1: il polling di /api/status riusa la stessa connessione TCP
+    protocol_version = "HTTP/1.1"
+    timeout = HTTP_KEEPALIVE_TIMEOUT  # Connessioni inattive chiuse, il thread non resta appeso
+    
+    def setup(self):
+        super().setup()
+        # Risposte piccole: inviale subito senza attendere l'algoritmo di Nagle
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def log_message(self, format, *args):
+        pass  # Suppress HTTP server logs
+        
+    def do_GET(self):
+        """Handle GET requests"""
+        if self.path == "/api/status":
+            # JSON API endpoint for status
+            system_info = cached_system_info()
+            # Una sola lettura della tupla: atem e tally sempre coerenti tra loro
+            atem_snapshot, tally_snapshot, _ = _status_snapshot
+            status_data = {
+                'atem': atem_snapshot,
+                'tally_state': tally_snapshot,
+                'wifi_ap': wifi_mode_ap,
+                'scan_in_progress': scan_in_progress,
+                'reader_thread_alive': bool(atem_reader_thread and atem_reader_thread.is_alive()),
+                'system': system_info,
+                'config': {
+                    'current_atem_ip': ATEM_IP,
+                    'last_successful_ip': config.get('last_successful_ip'),
+                    'wifi_ap_mode': wifi_mode_ap
+                }
+            }
+            
+            body = _dumps(status_data)
+            self.send_response(200)
+            self.send_header("Content-type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        
+        static = _STATIC_FILES.get(self.path)
+        if static is not None:
+            self.send_cached(*static, cache_control=f"public, max-age={STATIC_MAX_AGE}")
+            return
+        
+        # Main web interface
+        page, etag = render_page()
+        # La pagina dipende dalla configurazione: il browser la riconvalida ad ogni caricamento
+        self.send_cached(page, "text/html; charset=utf-8", etag, cache_control="no-cache")
+
+    def send_cached(self, body, content_type, etag, cache_control):
+        """Invia body gia codificato; 304 senza corpo se il browser ha gia la versione corrente"""
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
         
         self.send_response(200)
-        self.send_header("Content-type", "text/html; charset=utf-8")
+        self.send_header("Content-type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        self.send_header("ETag", etag)
         self.end_headers()
-        self.wfile.write(html.encode("utf-8"))
+        self.wfile.write(body)
 
     def do_POST(self):
         """Handle POST requests"""
         try:
             # Handle API restart reader
             if self.path == "/api/restart_reader":
-                restart_atem_reader()
+                reader_request_queue.put(False)
+                body = _dumps({"status": "ok"})
                 self.send_response(200)
                 self.send_header("Content-type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
                 self.end_headers()
-                self.wfile.write(json.dumps({"status": "ok"}).encode('utf-8'))
+                self.wfile.write(body)
                 return
             
             length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(length).decode('utf-8')
-            params = urllib.parse.parse_qs(post_data)
+            post_data = self.rfile.read(length)
             
             global ATEM_IP
             
             # Handle ATEM scan request
-            if "action" in params and params["action"][0] == "scan":
+            if _qget(post_data, b"action") == "scan":
                 logger.info("Richiesta scansione ATEM dal web interface")
                 
                 def run_scan():
+                    # La scansione non deve rubare CPU al loop multicast
+                    set_idle_priority()
                     localIP, network = get_local_ip_and_subnet()
                     if localIP:
                         find_atem(network, force_scan=True)
-                        # Riavvia il reader thread se trova un ATEM
+                        # Riavvia il reader thread se trova un ATEM: lo crea il worker a
+                        # priorita normale (i thread figli ereditano SCHED_IDLE da questo)
                         if ATEM_IP:
-                            restart_atem_reader()
+                            reader_request_queue.put(False)
                 
                 # Run scan in background thread
                 scan_thread = threading.Thread(target=run_scan, daemon=True)
@@ -891,35 +1724,42 @@ class ConfigHandler(BaseHTTPRequestHandler):
                 
             else:
                 # Handle configuration update
-                if "atem_ip" in params and params["atem_ip"][0].strip():
-                    new_ip = params["atem_ip"][0].strip()
+                new_ip = (_qget(post_data, b"atem_ip") or "").strip()
+                if new_ip:
                     if new_ip != ATEM_IP:
                         ATEM_IP = new_ip
                         config['atem_ip'] = ATEM_IP
-                        save_config(config)
                         logger.info(f"ATEM IP aggiornato manualmente: {ATEM_IP}")
                         
-                        # Riavvia il reader thread con il nuovo IP
-                        restart_atem_reader()
+                        # Salvataggio su SD e riavvio del reader in background: la risposta non attende
+                        reader_request_queue.put(True)
                 
                 # Handle WiFi mode change
-                new_wifi_mode = "wifi_ap" in params
+                new_wifi_mode = _qget(post_data, b"wifi_ap") is not None
                 if new_wifi_mode != wifi_mode_ap:
-                    setWifiMode(ap_mode=new_wifi_mode)
+                    # Lo script WiFi gira in background: la risposta non attende
+                    wifi_request_queue.put(new_wifi_mode)
             
             # Redirect back to main page
             self.send_response(303)
             self.send_header('Location', '/')
+            self.send_header('Content-Length', '0')
             self.end_headers()
             
         except Exception as e:
             logger.error(f"Errore elaborazione POST: {e}")
             self.send_error(500, "Errore interno server")
 
+class TallyHTTPServer(ThreadingHTTPServer):
+    """Server web con backlog ampio: i burst di connessioni non vengono rifiutati"""
+    daemon_threads = True
+    request_queue_size = 64
+
 def run_webserver():
     """Run the web server"""
     try:
-        server = HTTPServer(('', 8080), ConfigHandler)
+        # Un thread per connessione: un client lento non blocca gli altri
+        server = TallyHTTPServer(('', 8080), ConfigHandler)
         logger.info("Web server avviato su porta 8080")
         server.serve_forever()
     except Exception as e:
@@ -940,8 +1780,9 @@ def restart_atem_reader():
     # Disconnetti ATEM esistente
     atem_manager.disconnect()
     
-    # Reset evento stop
+    # Reset eventi stop e uscita inattesa
     atem_reader_stop_event.clear()
+    atem_reader_dead.clear()
     
     # Avvia nuovo thread
     atem_reader_thread = threading.Thread(target=atem_reader_thread_func, daemon=True, name="ATEMReader")
@@ -959,19 +1800,34 @@ if __name__ == "__main__":
     logger.info("Fase 1: Avvio web server...")
     webserver_thread = threading.Thread(target=run_webserver, daemon=True, name="WebServer")
     webserver_thread.start()
+    threading.Thread(target=wifi_worker_thread_func, daemon=True, name="WifiWorker").start()
+    threading.Thread(target=reader_worker_thread_func, daemon=True, name="ReaderWorker").start()
     time.sleep(2)
     logger.info("Web server avviato - Configurazione disponibile su http://[IP]:8080")
     
-    # Phase 2: Check for saved ATEM IP
-    if ATEM_IP:
-        logger.info(f"Fase 2: IP ATEM salvato trovato: {ATEM_IP}")
+    # Phase 2: Probe veloce degli IP salvati e degli host noti, scansione solo se non rispondono
+    saved_ips = list(dict.fromkeys(ip for ip in (ATEM_IP, config.get('last_successful_ip')) if ip))
+    candidates = list(dict.fromkeys(saved_ips + config.get('known_alive_ips', [])))
+    
+    # Un unico sweep UDP in parallelo; tra chi risponde vince l'IP salvato per primo
+    responders = set(atem_udp_sweep(candidates)) if candidates else set()
+    responding_ip = next((ip for ip in candidates if ip in responders), None)
+    if responding_ip:
+        ATEM_IP = responding_ip
+        logger.info(f"Fase 2: ATEM risponde sull'IP salvato: {ATEM_IP}")
     else:
-        logger.info("Fase 2: Nessun IP ATEM salvato, tentativo ricerca automatica...")
+        if candidates:
+            logger.info(f"Fase 2: IP noti non rispondono ({', '.join(saved_ips)}), tentativo ricerca automatica...")
+        else:
+            logger.info("Fase 2: Nessun IP ATEM salvato, tentativo ricerca automatica...")
         localIP, network = get_local_ip_and_subnet()
         if localIP:
             logger.info(f"IP Locale: {localIP}, Rete: {network}")
-            if find_atem(network):
+            # Gli IP salvati sono gia stati provati: vai diretto alla scansione
+            if find_atem(network, force_scan=True):
                 logger.info("ATEM trovato automaticamente!")
+            elif ATEM_IP:
+                logger.warning(f"ATEM non trovato, il lettore continuera a provare {ATEM_IP}")
             else:
                 logger.warning("ATEM non trovato, usa configurazione manuale via web")
                 ATEM_IP = FallbackIP
@@ -980,87 +1836,136 @@ if __name__ == "__main__":
     logger.info("Fase 3: Avvio thread lettore ATEM...")
     atem_reader_thread = threading.Thread(target=atem_reader_thread_func, daemon=True, name="ATEMReader")
     atem_reader_thread.start()
+    threading.Thread(target=discovery_worker_thread_func, daemon=True, name="Discovery").start()
     
     # Phase 4: Setup multicast socket
     try:
         mcastSock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         mcastSock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, TTL)
-        logger.info(f"Socket multicast configurato: {MCAST_GRP}:{MCAST_PORT}")
+        mcastSock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        # Nessun ricevitore tally su questo host: niente copia in loopback di ogni pacchetto
+        mcastSock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 0)
+        # Non bloccante: se la coda della scheda di rete e piena il frame si salta,
+        # il loop non si ferma (il prossimo ciclo reinvia lo stato completo)
+        mcastSock.setblocking(False)
+        # Destinazione fissa: connect una volta, poi send() senza indirizzo ad ogni ciclo
+        try:
+            mcastSock.connect((MCAST_GRP, MCAST_PORT))
+            mcast_connected = True
+        except OSError as e:
+            # Nessuna route multicast per ora (es. AP non ancora attivo): si usa sendto
+            logger.warning(f"Connect multicast non riuscito ({e}), uso sendto")
+            mcast_connected = False
+        logger.info(f"Socket multicast configurato: {MCAST_GRP}:{MCAST_PORT}, "
+                    f"SO_SNDBUF={mcastSock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)}")
     except Exception as e:
         logger.error(f"Errore setup socket multicast: {e}")
         sys.exit(1)
 
     # Phase 5: Main tally multicast loop
     logger.info("=== Avvio loop multicast principale ===")
+    # Cadenza stabile: CPU dedicata e priorita realtime (se consentito)
+    set_tally_priority(config.get('tally_cpu'))
+    # Lo stop del servizio passa dalla stessa pulizia dell'interruzione manuale
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     
-    last_state_check = time.time()
     data_timeout_warned = False
+    last_tally = None  # (attivo, live, preview, autolive) scritto in TallyState
+    log_countdown = LOG_EVERY
+    next_tick = time.monotonic()  # Scadenza del prossimo invio, senza deriva
+    last_send_time = 0.0  # Ultimo invio, per il keepalive del frame invariato
+    send_error_logged = False  # Errore di invio gia segnalato: niente log ad ogni ciclo
+    # Riferimenti usati ad ogni ciclo, risolti una volta sola
+    # TallyState viene modificato sul posto: il sender invia sempre il contenuto corrente
+    send_frame = make_sender(mcastSock, (MCAST_GRP, MCAST_PORT), TallyState, mcast_connected)
+    monotonic = time.monotonic
+    tally_len = len(TallyState)
     
     try:
         while True:
             try:
-                # Check data freshness
-                current_time = time.time()
-                data_age = None
-                if atem_status.get('last_data_time'):
-                    data_age = current_time - atem_status['last_data_time']
-                    
-                    # Avvisa se i dati sono obsoleti
-                    if data_age > ATEM_DATA_STALE_TIMEOUT:
-                        if not data_timeout_warned:
-                            logger.warning(f"Dati ATEM obsoleti da {data_age:.0f} secondi")
-                            data_timeout_warned = True
-                    else:
-                        data_timeout_warned = False
+                # Check data freshness (orologio monotonic: immune ai salti dell'ora di sistema)
+                current_time = monotonic()
+                snap = _snapshot
+                # Scadenza precalcolata dal lettore: un solo confronto per ciclo
+                fresh = current_time < snap.stale_at
+                if fresh:
+                    data_timeout_warned = False
+                elif snap.ts is not None and not data_timeout_warned:
+                    # Avvisa una sola volta quando i dati diventano obsoleti
+                    logger.warning(f"Dati ATEM obsoleti da {current_time - snap.ts:.0f} secondi")
+                    data_timeout_warned = True
                 
-                # Reset tally array
-                for i in range(len(TallyState)):
-                    TallyState[i] = Clear
+                # Tally accese solo con sistema attivo e dati freschi (meno di 10 secondi)
+                tally = (dict_state['isActive'] and fresh, snap.live, snap.preview, snap.autolive)
                 
-                # Set tally states if system is active
-                if dict_state['isActive']:
-                    # Solo se i dati sono freschi (meno di 10 secondi)
-                    if data_age is None or data_age > ATEM_DATA_STALE_TIMEOUT:
-                        # Dati troppo vecchi, non inviare tally
-                        pass
-                    else:
-                        with lock:
-                            live_val = dict_state['Live']
-                            preview_val = dict_state['Preview']
-                            autolive_val = dict_state['Autolive']
-                        
-                        # Preview state
-                        if autolive_val == 0 and preview_val > 0:
-                            if preview_val <= len(TallyState):
-                                TallyState[preview_val - 1] = Preview
-                        
-                        # Live state
-                        if live_val > 0 and live_val <= len(TallyState):
-                            TallyState[live_val - 1] = Live
+                # Riscrivi il frame solo se lo stato e cambiato, altrimenti si reinvia lo stesso buffer
+                changed = tally != last_tally
+                if changed:
+                    last_tally = tally
+                    active, live_val, preview_val, autolive_val = tally
+                    
+                    # Indici dei due canali accesi, -1 se spenti
+                    # (Preview solo se non in Autolive mode; Live scritto dopo, ha la precedenza)
+                    preview_idx = preview_val - 1 if active and autolive_val == 0 and 0 < preview_val <= tally_len else -1
+                    live_idx = live_val - 1 if active and 0 < live_val <= tally_len else -1
+                    
+                    # Reset tally array (una sola copia in C)
+                    TallyState[:] = TALLY_CLEAR_FRAME
+                    if preview_idx >= 0:
+                        TallyState[preview_idx] = Preview
+                    if live_idx >= 0:
+                        TallyState[live_idx] = Live
                 
-                # Send multicast packet
-                mcastSock.sendto(bytearray(TallyState), (MCAST_GRP, MCAST_PORT))
-                system_stats['total_packets_sent'] += 1
+                # Send multicast packet: subito ad ogni cambio, altrimenti solo come keepalive
+                if changed or current_time - last_send_time >= TallyKeepaliveInterval:
+                    try:
+                        send_frame()
+                        last_send_time = current_time
+                        system_stats['total_packets_sent'] += 1
+                        send_error_logged = False
+                    except BlockingIOError:
+                        logger.debug("Buffer socket pieno, frame multicast saltato")
+                    except OSError as e:
+                        # Rete assente (ENETUNREACH, ENOBUFS...): si riprova al prossimo ciclo, senza uscire dalla cadenza
+                        system_stats['send_errors'] += 1
+                        if not send_error_logged:
+                            logger.error(f"Errore invio multicast: {e}")
+                            send_error_logged = True
                 
-                # Log periodico
-                if system_stats['total_packets_sent'] % 100 == 0:
-                    active_tallies = [i+1 for i, state in enumerate(TallyState) if state != Clear]
-                    if active_tallies:
-                        logger.debug(f"Multicast #{system_stats['total_packets_sent']}, Tally attive: {active_tallies}")
+                # Log periodico ogni LOG_EVERY cicli (la lista si costruisce solo con DEBUG attivo)
+                log_countdown -= 1
+                if not log_countdown:
+                    log_countdown = LOG_EVERY
+                    if logger.isEnabledFor(logging.DEBUG):
+                        active_tallies = [i+1 for i, state in enumerate(TallyState) if state != Clear]
+                        if active_tallies:
+                            logger.debug("Multicast #%d, Tally attive: %s", system_stats['total_packets_sent'], active_tallies)
                 
-                # Check thread health ogni 10 secondi
-                if current_time - last_state_check > 10:
-                    if not atem_reader_thread.is_alive():
-                        logger.error("Thread lettore ATEM non attivo! Riavvio...")
-                        restart_atem_reader()
-                    last_state_check = current_time
+                # Il thread lettore segnala da solo se termina: nessun polling di is_alive()
+                # Il riavvio lo esegue il worker: il loop non crea thread e non attende join
+                if atem_reader_dead.is_set():
+                    logger.error("Thread lettore ATEM non attivo! Riavvio...")
+                    atem_reader_dead.clear()
+                    reader_request_queue.put(False)
                 
-                # Sleep fino al prossimo ciclo
-                time.sleep(TallySendInterval)
+                # Sleep fino alla prossima scadenza: il tempo di lavoro non si accumula
+                next_tick += TallySendInterval
+                delay = next_tick - monotonic()
+                if delay > 0:
+                    # Attesa interrompibile: un cambio tally viene inviato subito, senza attendere il ciclo
+                    if tally_changed.wait(delay):
+                        tally_changed.clear()
+                        next_tick = monotonic()  # La cadenza riparte dall'invio anticipato
+                elif delay < -TallySendInterval:
+                    # In ritardo di piu di un ciclo: salta i cicli persi
+                    logger.debug("Loop multicast in ritardo di %.3fs, riallineamento", -delay)
+                    next_tick = monotonic()
                 
             except Exception as e:
                 logger.error(f"Errore nel loop multicast: {e}")
                 time.sleep(1)
+                next_tick = time.monotonic()
                 
     except KeyboardInterrupt:
         logger.info("Interruzione manuale ricevuta...")
@@ -1068,13 +1973,13 @@ if __name__ == "__main__":
     # Cleanup
     logger.info("Avvio procedura di chiusura...")
     
-    # Ferma thread lettore ATEM
+    # Ferma thread lettore ATEM: disconnette prima del join, cosi il lettore
+    # esce subito dalle attese. Entrambe le attese sono limitate da SHUTDOWN_TIMEOUT:
+    # un connect in corso non blocca la chiusura (il lettore e un thread daemon)
     atem_reader_stop_event.set()
+    atem_manager.disconnect(timeout=SHUTDOWN_TIMEOUT)
     if atem_reader_thread:
-        atem_reader_thread.join(timeout=5)
-    
-    # Disconnetti ATEM
-    atem_manager.disconnect()
+        atem_reader_thread.join(timeout=SHUTDOWN_TIMEOUT)
     
     # Chiudi socket
     mcastSock.close()
@@ -0,0 +1,39 @@
+"""Registrazione dell'evento receive sull'oggetto PyATEMMax reale"""
+import os
+import sys
+
+import pytest
+
+PyATEMMax = pytest.importorskip("PyATEMMax")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import atem  # noqa: E402
+import atemv3  # noqa: E402
+
+
+@pytest.fixture
+def no_handshake(monkeypatch):
+    """Nessun ATEM in rete: la connessione risulta subito stabilita"""
+    monkeypatch.setattr(PyATEMMax.ATEMMax, "waitForConnection", lambda self, timeout=None: True)
+    monkeypatch.setattr(atemv3.time, "sleep", lambda s: None)
+
+
+def test_manager_connect_registers_receive(no_handshake):
+    received = []
+    manager = atemv3.ATEMConnectionManager(on_data=lambda live, preview: received.append((live, preview)))
+    try:
+        assert manager.connect("127.0.0.1"), manager.last_error
+        switcher = manager.atem
+        assert manager._on_receive in switcher._eventSubscriptions[switcher.atem.events.receive]
+
+        # Parametri come li emette PyATEMMax per un cambio Program
+        manager._on_receive({'switcher': switcher, 'cmd': 'PrgI', 'cmdName': switcher.atem.commands['PrgI']})
+        assert len(received) == 1
+    finally:
+        manager.disconnect()
+
+
+def test_atem_init_registers_receive():
+    switcher = atem.atem_init()
+    assert atem._on_atem_receive in switcher._eventSubscriptions[switcher.atem.events.receive]